@@ -3,7 +3,7 @@ import pandas as pd
 import plotly.express as px
 import database
 import dashboard
-from utils import display_message
+from utils import display_message, lazy_tabs
 from datetime import datetime
 
 def show_admin_dashboard():
@@ -14,32 +14,18 @@ def show_admin_dashboard():
     if st.session_state.user_id:
         dashboard.show_notifications(st.session_state.user_id)
     
-    # Create tabs for different sections
-    tabs = st.tabs(["Overview", "Inventory", "Blood Requests", "Donors", "Receivers", "Reports"])
-    
-    # Overview Tab
-    with tabs[0]:
-        show_overview()
-    
-    # Inventory Tab
-    with tabs[1]:
-        show_inventory_management()
-    
-    # Blood Requests Tab
-    with tabs[2]:
-        show_blood_request_management()
-    
-    # Donors Tab
-    with tabs[3]:
-        show_donor_management()
-    
-    # Receivers Tab
-    with tabs[4]:
-        show_receiver_management()
-    
-    # Reports Tab
-    with tabs[5]:
-        show_reports()
+    sections = {
+        "Overview": show_overview,
+        "Inventory": show_inventory_management,
+        "Blood Requests": show_blood_request_management,
+        "Donors": show_donor_management,
+        "Receivers": show_receiver_management,
+        "Reports": show_reports
+    }
+    
+    # Only the selected section runs, so a rerun queries and charts just that one
+    section = lazy_tabs(list(sections), key="admin_section")
+    sections[section]()
 
 def show_overview():
     """Display the overview dashboard with key metrics"""
@@ -71,27 +57,8 @@ def show_overview():
     
     # Display pending requests
     st.subheader("Pending Blood Requests")
-    pending_requests = database.get_blood_requests(status="pending")
-    
-    if not pending_requests:
-        st.info("No pending blood requests.")
-    else:
-        # Convert to DataFrame for display
-        df_data = []
-        for req in pending_requests:
-            df_data.append({
-                'Request ID': req.get('request_id', 'Unknown'),
-                'Blood Group': req.get('blood_group', 'Unknown'),
-                'Units': req.get('units', 0),
-                'Urgency': req.get('urgency', 'Normal'),
-                'Requester': req.get('requester_name', 'Unknown'),
-                'Organization': req.get('organization', 'Unknown'),
-                'Created At': req.get('created_at', 'Unknown date')
-            })
-        
-        if df_data:
-            df = pd.DataFrame(df_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
+    # Paged like the request management tables, so a long queue loads one page
+    dashboard.display_blood_requests(status="pending", key="overview_pending")
     
     # Display blood inventory overview
     st.subheader("Blood Inventory Overview")
@@ -131,11 +98,11 @@ def show_inventory_management():
             else:
                 try:
                     # Calculate new value
-                    new_units = current_units + units if action == "Add" else current_units - units
+                    change = units if action == "Add" else -units
+                    new_units = current_units + change
                     
-                    # Update inventory
-                    update_data = {blood_group: new_units}
-                    result = database.update_blood_inventory(update_data)
+                    # Apply the change as an increment so concurrent updates aren't lost
+                    result = database.adjust_blood_inventory(blood_group, change)
                     
                     if result:
                         display_message("success", f"Inventory updated successfully! {blood_group}: {current_units} → {new_units}")
@@ -151,7 +118,7 @@ def show_inventory_management():
                             'updated_by': st.session_state.user_id,
                             'timestamp': datetime.now().isoformat()
                         }
-                        print(f"Inventory transaction: {transaction_record}")
+                        database.logger.info("Inventory transaction: %s", transaction_record)
                         
                         # Refresh the page to show updated inventory
                         st.rerun()
@@ -164,11 +131,11 @@ def show_blood_request_management():
     """Display and manage blood requests"""
     st.header("Blood Request Management")
     
-    # Create tabs for different request statuses
-    tab1, tab2, tab3, tab4 = st.tabs(["Pending", "Approved", "Completed", "Cancelled"])
+    # Select a request status; only its table is loaded
+    status_tab = lazy_tabs(["Pending", "Approved", "Completed", "Cancelled"], key="admin_request_status")
     
     # Pending Requests Tab
-    with tab1:
+    if status_tab == "Pending":
         st.subheader("Pending Requests")
         pending_df = dashboard.display_blood_requests(status="pending")
         
@@ -183,12 +150,8 @@ def show_blood_request_management():
                                             options=list(request_options.keys()),
                                             format_func=lambda x: request_options[x])
             
-            # Get selected request details
-            selected_request = None
-            for _, row in pending_df.iterrows():
-                if row['Request ID'] == selected_request_id:
-                    selected_request = row['Full Data']
-                    break
+            # The table only holds the listed fields, so load the selected request in full
+            selected_request = database.get_blood_request(selected_request_id)
             
             if selected_request:
                 col1, col2 = st.columns(2)
@@ -255,8 +218,7 @@ def show_blood_request_management():
                                 })
                                 
                                 # Update inventory
-                                new_units = units_available - units_requested
-                                database.update_blood_inventory({blood_group: new_units})
+                                database.adjust_blood_inventory(blood_group, -units_requested)
                                 
                                 # Notify requester
                                 notification_data = {
@@ -296,17 +258,17 @@ def show_blood_request_management():
                             display_message("error", f"Failed to reject request: {str(e)}")
     
     # Approved Requests Tab
-    with tab2:
+    elif status_tab == "Approved":
         st.subheader("Approved Requests")
         dashboard.display_blood_requests(status="approved")
     
     # Completed Requests Tab
-    with tab3:
+    elif status_tab == "Completed":
         st.subheader("Completed Requests")
         dashboard.display_blood_requests(status="completed")
     
     # Cancelled Requests Tab
-    with tab4:
+    elif status_tab == "Cancelled":
         st.subheader("Cancelled/Rejected Requests")
         cancelled_df = dashboard.display_blood_requests(status="cancelled")
         rejected_df = dashboard.display_blood_requests(status="rejected")
@@ -315,8 +277,9 @@ def show_donor_management():
     """Display and manage donors"""
     st.header("Donor Management")
     
-    # Get all donors
-    donors = database.get_all_users(role="donor")
+    # Get only the columns the table needs; the full record is loaded on selection
+    donors = database.get_all_users(role="donor", fields=[
+        'name', 'blood_group', 'phone', 'city', 'available', 'donation_count'])
     
     if not donors:
         st.info("No donors registered yet.")
@@ -332,13 +295,12 @@ def show_donor_management():
             'Phone': donor.get('phone', 'Unknown'),
             'City': donor.get('city', 'Unknown'),
             'Available': '✅' if donor.get('available', False) else '❌',
-            'Donations': len(donor.get('donation_history', [])),
-            'Full Data': donor
+            'Donations': donor.get('donation_count', 0)
         })
     
     if donor_data:
         df = pd.DataFrame(donor_data)
-        display_df = df.drop(columns=['Full Data', 'ID'])
+        display_df = df.drop(columns=['ID'])
         st.dataframe(display_df, use_container_width=True, hide_index=True)
     
     # Donor details and actions
@@ -352,11 +314,7 @@ def show_donor_management():
                                        format_func=lambda x: donor_options[x])
         
         # Get selected donor details
-        selected_donor = None
-        for donor in donor_data:
-            if donor['ID'] == selected_donor_id:
-                selected_donor = donor['Full Data']
-                break
+        selected_donor = database.get_user_by_id(selected_donor_id)
         
         if selected_donor:
             col1, col2 = st.columns(2)
@@ -373,11 +331,11 @@ def show_donor_management():
                 st.write("**Donation Status**")
                 st.write(f"Blood Group: {selected_donor.get('blood_group', 'Unknown')}")
                 st.write(f"Available for donation: {'Yes' if selected_donor.get('available', False) else 'No'}")
-                donation_history = selected_donor.get('donation_history', [])
-                st.write(f"Total donations: {len(donation_history)}")
+                st.write(f"Total donations: {selected_donor.get('donation_count', 0)}")
             
             # Donation history
             st.write("**Donation History**")
+            donation_history = database.get_donor_donations(selected_donor_id)
             
             if not donation_history:
                 st.info("No donation history available.")
@@ -417,8 +375,9 @@ def show_receiver_management():
     """Display and manage receivers"""
     st.header("Receiver Management")
     
-    # Get all receivers
-    receivers = database.get_all_users(role="receiver")
+    # Get only the columns the table needs; the full record is loaded on selection
+    receivers = database.get_all_users(role="receiver", fields=[
+        'name', 'organization', 'phone', 'city', 'request_count'])
     
     if not receivers:
         st.info("No receivers registered yet.")
@@ -433,13 +392,12 @@ def show_receiver_management():
             'Organization': receiver.get('organization', 'Unknown'),
             'Phone': receiver.get('phone', 'Unknown'),
             'City': receiver.get('city', 'Unknown'),
-            'Requests': len(receiver.get('request_history', [])),
-            'Full Data': receiver
+            'Requests': receiver.get('request_count', 0)
         })
     
     if receiver_data:
         df = pd.DataFrame(receiver_data)
-        display_df = df.drop(columns=['Full Data', 'ID'])
+        display_df = df.drop(columns=['ID'])
         st.dataframe(display_df, use_container_width=True, hide_index=True)
     
     # Receiver details and actions
@@ -453,11 +411,7 @@ def show_receiver_management():
                                           format_func=lambda x: receiver_options[x])
         
         # Get selected receiver details
-        selected_receiver = None
-        for receiver in receiver_data:
-            if receiver['ID'] == selected_receiver_id:
-                selected_receiver = receiver['Full Data']
-                break
+        selected_receiver = database.get_user_by_id(selected_receiver_id)
         
         if selected_receiver:
             col1, col2 = st.columns(2)
@@ -473,11 +427,11 @@ def show_receiver_management():
                 st.write("**Address Information**")
                 st.write(f"Address: {selected_receiver.get('address', 'Unknown')}")
                 st.write(f"City: {selected_receiver.get('city', 'Unknown')}")
-                request_history = selected_receiver.get('request_history', [])
-                st.write(f"Total requests: {len(request_history)}")
+                st.write(f"Total requests: {selected_receiver.get('request_count', 0)}")
             
             # Request history
             st.write("**Request History**")
+            request_history = database.get_user_requests(selected_receiver_id)
             
             if not request_history:
                 st.info("No request history available.")
@@ -517,13 +471,14 @@ def show_reports():
     """Display system reports and analytics"""
     st.header("Reports and Analytics")
     
-    # Display tabs for different reports
-    tab1, tab2, tab3 = st.tabs(["Donation Statistics", "Request Statistics", "Inventory Analysis"])
+    # Select a report; only its statistics and charts are computed
+    report_tab = lazy_tabs(["Donation Statistics", "Request Statistics", "Inventory Analysis"], key="admin_report")
     
     # Donation Statistics Tab
-    with tab1:
+    if report_tab == "Donation Statistics":
         st.subheader("Donation Statistics")
         
+        version = database.get_data_version('donations')
         donation_stats = database.get_donation_stats()
         total_donations = donation_stats.get('total_donations', 0)
         donations_by_group = donation_stats.get('donations_by_group', {})
@@ -531,22 +486,13 @@ def show_reports():
         st.metric("Total Donations", total_donations)
         
         if donations_by_group:
-            # Create dataframe for chart
-            df = pd.DataFrame({
-                'Blood Group': list(donations_by_group.keys()),
-                'Donations': list(donations_by_group.values())
-            })
-            
-            # Create pie chart
-            fig = px.pie(df, values='Donations', names='Blood Group', 
-                         title='Donations by Blood Group',
-                         color_discrete_sequence=px.colors.sequential.RdBu)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(_donations_chart(version, donations_by_group), use_container_width=True)
     
     # Request Statistics Tab
-    with tab2:
+    elif report_tab == "Request Statistics":
         st.subheader("Request Statistics")
         
+        version = database.get_data_version('blood_requests')
         request_stats = database.get_request_stats()
         
         col1, col2, col3, col4 = st.columns(4)
@@ -566,32 +512,16 @@ def show_reports():
         requests_by_group = request_stats.get('requests_by_group', {})
         
         if requests_by_group:
-            # Create dataframe for chart
-            df = pd.DataFrame({
-                'Blood Group': list(requests_by_group.keys()),
-                'Requests': list(requests_by_group.values())
-            })
-            
-            # Create bar chart
-            fig = px.bar(df, x='Blood Group', y='Requests', 
-                        title='Requests by Blood Group',
-                        color='Blood Group')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(_requests_chart(version, requests_by_group), use_container_width=True)
     
     # Inventory Analysis Tab
-    with tab3:
+    elif report_tab == "Inventory Analysis":
         st.subheader("Inventory Analysis")
         
         # Get current inventory
         inventory = database.get_blood_inventory()
         
         if inventory:
-            # Create dataframe for inventory
-            df = pd.DataFrame({
-                'Blood Group': list(inventory.keys()),
-                'Units Available': list(inventory.values())
-            })
-            
             # Create a gauge chart for each blood group
             for blood_group in inventory:
                 value = inventory[blood_group]
@@ -621,3 +551,27 @@ def show_reports():
                         st.write("⚠️ **Low inventory.** Donation recommended.")
                     else:
                         st.write("✅ **Good inventory level.**")
+
+# Report charts are rebuilt only when the collection behind them changes;
+# the stats argument is not hashed, the collection version stands for it
+@st.cache_resource(max_entries=dashboard.CHART_CACHE_ENTRIES, show_spinner=False)
+def _donations_chart(version, _donations_by_group):
+    """Pie chart of donations by blood group for a donations version."""
+    df = pd.DataFrame({
+        'Blood Group': list(_donations_by_group.keys()),
+        'Donations': list(_donations_by_group.values())
+    })
+    return px.pie(df, values='Donations', names='Blood Group', 
+                  title='Donations by Blood Group',
+                  color_discrete_sequence=px.colors.sequential.RdBu)
+
+@st.cache_resource(max_entries=dashboard.CHART_CACHE_ENTRIES, show_spinner=False)
+def _requests_chart(version, _requests_by_group):
+    """Bar chart of requests by blood group for a blood_requests version."""
+    df = pd.DataFrame({
+        'Blood Group': list(_requests_by_group.keys()),
+        'Requests': list(_requests_by_group.values())
+    })
+    return px.bar(df, x='Blood Group', y='Requests', 
+                  title='Requests by Blood Group',
+                  color='Blood Group')
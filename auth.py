@@ -143,25 +143,29 @@ def show_signup_form():
                 user_data.update({
                     "blood_group": blood_group,
                     "available": available,
-                    "donation_history": []
+                    "donation_count": 0,
+                    "units_donated": 0
                 })
             else:  # receiver
                 user_data.update({
                     "organization": organization,
-                    "request_history": []
+                    "request_count": 0
                 })
             
             # Save user data to Firestore
             db = database.get_firestore_db()
-            db.collection('users').document(user['localId']).set(user_data)
+            try:
+                db.collection('users').document(user['localId']).set(user_data)
+            except database.UniqueConstraintError:
+                # Another session registered the email after the check above
+                raise Exception("EMAIL_EXISTS")
             
             # Create welcome notification
             welcome_message = {
                 'message': f"Welcome to the Blood Bank Management System! Your account has been created successfully as a {role}.",
-                'type': 'welcome',
-                'read': False
+                'type': 'welcome'
             }
-            db.collection('users').document(user['localId']).collection('notifications').add(welcome_message)
+            database.create_notification(user['localId'], welcome_message)
             
             st.success("Account created successfully! You can now log in.")
             
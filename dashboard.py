@@ -4,10 +4,36 @@ import plotly.express as px
 import database
 from datetime import datetime
 
+# Notifications loaded per page in the notifications panel
+NOTIFICATIONS_PAGE_SIZE = 10
+
+# Chart figures and frames kept per builder; old data versions are evicted first
+CHART_CACHE_ENTRIES = 8
+
+# Blood requests shown per page in request tables
+REQUESTS_PAGE_SIZE = 20
+
+# Fields loaded for request table rows; the full request is loaded on selection
+REQUEST_TABLE_FIELDS = ['request_id', 'blood_group', 'units', 'urgency', 'location',
+                        'status', 'requester_name', 'organization', 'created_at']
+
 def show_notifications(user_id):
     """Display notifications for the current user"""
-    with st.expander("📬 Notifications"):
-        notifications = database.get_notifications(user_id)
+    unread_count = database.get_unread_notification_count(user_id)
+    label = f"📬 Notifications ({unread_count} unread)" if unread_count else "📬 Notifications"
+    
+    with st.expander(label):
+        # Load only the newest page; "Show More" grows it
+        limit_key = f"notifications_limit_{user_id}"
+        limit = st.session_state.get(limit_key, NOTIFICATIONS_PAGE_SIZE)
+        notifications = database.get_notifications(user_id, limit=limit + 1)
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+        
+        if unread_count:
+            if st.button("Mark All Read", key=f"read_all_{user_id}"):
+                database.mark_all_notifications_as_read(user_id)
+                st.rerun()
         
         if not notifications:
             st.info("No notifications yet.")
@@ -42,6 +68,11 @@ def show_notifications(user_id):
                             st.rerun()
                 
                 st.divider()
+            
+            if has_more:
+                if st.button("Show More", key=f"more_notifications_{user_id}"):
+                    st.session_state[limit_key] = limit + NOTIFICATIONS_PAGE_SIZE
+                    st.rerun()
 
 def show_blood_inventory(key_suffix=""):
     """Display the current blood inventory
@@ -49,16 +80,32 @@ def show_blood_inventory(key_suffix=""):
     Args:
         key_suffix (str): A unique suffix for chart keys to avoid duplicates
     """
+    # Read the version first, so a write in between only causes an extra rebuild
+    version = database.get_data_version('inventory', 'blood_inventory')
     inventory = database.get_blood_inventory()
     
     if not inventory:
         st.warning("No blood inventory data available.")
         return
     
+    inventory_df, fig = _inventory_chart(version, inventory)
+    
+    # Use a unique key for the chart
+    st.plotly_chart(fig, use_container_width=True, key=f"blood_inventory_chart_{key_suffix}")
+    
+    # Also show as a table with a unique key
+    st.dataframe(inventory_df, use_container_width=True, hide_index=True, key=f"blood_inventory_table_{key_suffix}")
+
+@st.cache_resource(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def _inventory_chart(version, _inventory):
+    """Build the inventory DataFrame and bar chart once per inventory version.
+    
+    The leading underscore keeps Streamlit from hashing the inventory; the version stands for it.
+    """
     # Convert to DataFrame for better display
     inventory_df = pd.DataFrame({
-        'Blood Group': list(inventory.keys()),
-        'Units Available': list(inventory.values())
+        'Blood Group': list(_inventory.keys()),
+        'Units Available': list(_inventory.values())
     })
     
     # Display as a bar chart with Streamlit's theme colors
@@ -77,26 +124,39 @@ def show_blood_inventory(key_suffix=""):
         yaxis_title="Units Available",
         legend_title="Blood Group"
     )
+    return inventory_df, fig
+
+def display_blood_requests(status=None, user_id=None, role=None, key=None):
+    """Display one page of blood requests with optional filtering
     
-    # Use a unique key for the chart
-    st.plotly_chart(fig, use_container_width=True, key=f"blood_inventory_chart_{key_suffix}")
+    Only the table's fields are loaded, a page at a time; load a request's
+    full data with database.get_blood_request when it is selected.
     
-    # Also show as a table with a unique key
-    st.dataframe(inventory_df, use_container_width=True, hide_index=True, key=f"blood_inventory_table_{key_suffix}")
-
-def display_blood_requests(status=None, user_id=None, role=None):
-    """Display blood requests with optional filtering"""
+    Args:
+        key (str): A unique key for this table's paging state and widgets
+    """
+    key = key or f"requests_{status or 'all'}_{user_id or 'all'}"
+    
+    # Each entry is the request_id a page starts after; the last one is the current page
+    page_starts = st.session_state.setdefault(f"{key}_page_starts", [None])
     
-    # Get blood requests based on filters
+    # Fetch one extra row to know whether there is a next page
     if user_id and role == 'receiver':
-        # For receivers, get only their own requests
-        all_requests = database.get_blood_requests()
-        requests = [r for r in all_requests if r.get('user_id') == user_id]
+        # For receivers, get only their own requests through the user_id index
+        requests = database.get_user_requests(user_id, limit=REQUESTS_PAGE_SIZE + 1,
+                                              start_after=page_starts[-1], fields=REQUEST_TABLE_FIELDS)
     else:
         # For admins or donors, get all or filtered by status
-        requests = database.get_blood_requests(status)
+        requests = database.get_blood_requests(status, limit=REQUESTS_PAGE_SIZE + 1,
+                                               start_after=page_starts[-1], fields=REQUEST_TABLE_FIELDS)
+    has_more = len(requests) > REQUESTS_PAGE_SIZE
+    requests = requests[:REQUESTS_PAGE_SIZE]
     
     if not requests:
+        if len(page_starts) > 1:
+            # The page emptied out (requests were processed), so go back to the first one
+            st.session_state[f"{key}_page_starts"] = [None]
+            st.rerun()
         st.info("No blood requests found.")
         return
     
@@ -123,18 +183,25 @@ def display_blood_requests(status=None, user_id=None, role=None):
             'Location': req.get('location', 'Unknown'),
             'Status': req.get('status', 'Unknown'),
             'Requested By': req.get('requester_name', 'Unknown'),
-            'Request Date': timestamp,
-            'Full Data': req  # Store full data for actions
+            'Organization': req.get('organization', 'Unknown'),
+            'Request Date': timestamp
         })
     
     requests_df = pd.DataFrame(request_data)
     
     # Display as table
-    if 'Full Data' in requests_df.columns:
-        display_df = requests_df.drop(columns=['Full Data'])
-    else:
-        display_df = requests_df
+    st.dataframe(requests_df, use_container_width=True, hide_index=True)
     
-    st.dataframe(display_df, use_container_width=True, hide_index=True)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(page_starts) > 1 and st.button("Previous", key=f"{key}_previous", use_container_width=True):
+            page_starts.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(page_starts)}")
+    with col3:
+        if has_more and st.button("Next", key=f"{key}_next", use_container_width=True):
+            page_starts.append(requests[-1].get('request_id'))
+            st.rerun()
     
     return requests_df
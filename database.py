@@ -1,8 +1,23 @@
 import os
-from datetime import datetime
+import atexit
+import bisect
+from datetime import datetime, timedelta
+import hashlib
+import itertools
 import json
+import logging
+import math
+import queue
+import re
+import sqlite3
+import string
+import threading
+import time
 import uuid  # For generating unique IDs
-import streamlit as st
+from collections import OrderedDict, deque
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from types import MappingProxyType
 
 # Firebase configuration - keep this for reference
 firebase_config = {
@@ -16,254 +31,2204 @@ firebase_config = {
     "databaseURL": ""  # Required for Pyrebase initialization but not used
 }
 
-# Initialize mock database storage in session state for persistence within the session
+# Storage backend for the mock database: 'memory' (default) or 'sqlite'
+DB_BACKEND = os.environ.get('DONORLINK_DB_BACKEND', 'memory')
+SQLITE_PATH = os.environ.get('DONORLINK_SQLITE_PATH', 'donorlink.db')
+# Set to '0' to turn off the Bloom filter in front of SQLite unique lookups
+BLOOM_FILTER = os.environ.get('DONORLINK_BLOOM_FILTER', '1') != '0'
+
+# Logging for the app; DONORLINK_LOG_LEVEL sets the level (WARNING by default)
+logger = logging.getLogger('donorlink')
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(_log_handler)
+logger.setLevel(os.environ.get('DONORLINK_LOG_LEVEL', 'WARNING').upper())
+
+_initialized = False
+
+# Initialize the process-wide mock database shared by every session
 def initialize_firebase():
     """Initialize mock Firebase services for demonstration purposes."""
-    # Initialize session state for mock database if not exists
-    if 'mock_db' not in st.session_state:
-        st.session_state.mock_db = {
-            'users': {},
-            'blood_requests': {},
-            'inventory': {
-                'blood_inventory': {
-                    "A+": 10,
-                    "A-": 5,
-                    "B+": 8,
-                    "B-": 4,
-                    "AB+": 3,
-                    "AB-": 2,
-                    "O+": 15,
-                    "O-": 7,
-                    "last_updated": datetime.now().isoformat()
-                }
-            }
+    global _initialized
+    # The data store is created and seeded once per process
+    if not _initialized:
+        get_data_store()
+        _initialized = True
+        logger.info("Mock Firebase initialized with the %s backend", DB_BACKEND)
+    return True
+
+class MockHashIndex:
+    """Hash index mapping the values of one field to the ids of the documents holding them."""
+    def __init__(self, field):
+        self.field = field
+        self._buckets = {}  # value -> ordered set of document ids
+        self._values = {}   # document id -> indexed value
+
+    def add(self, doc_id, data):
+        # Drop the previous entry first so changed values move buckets
+        self.remove(doc_id)
+        if self.field not in data:
+            return
+        value = data[self.field]
+        try:
+            bucket = self._buckets.setdefault(value, {})
+        except TypeError:
+            # Lists and maps can't be matched with an equality lookup
+            return
+        bucket[doc_id] = None
+        self._values[doc_id] = value
+
+    def remove(self, doc_id):
+        if doc_id not in self._values:
+            return
+        value = self._values.pop(doc_id)
+        bucket = self._buckets.get(value)
+        if bucket is not None:
+            bucket.pop(doc_id, None)
+            if not bucket:
+                del self._buckets[value]
+
+    def lookup(self, value):
+        # Raises TypeError for unhashable values, callers fall back to a scan
+        return self._buckets.get(value, {})
+
+class MockCompositeIndex:
+    """Hash index over an ordered tuple of fields, bucketing documents by every key prefix."""
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._buckets = {}  # key prefix tuple -> ordered set of document ids
+        self._keys = {}     # document id -> prefix keys it is filed under
+
+    def add(self, doc_id, data):
+        self.remove(doc_id)
+        keys = []
+        prefix = ()
+        for field in self.fields:
+            if field not in data:
+                break
+            prefix = prefix + (data[field],)
+            try:
+                self._buckets.setdefault(prefix, {})[doc_id] = None
+            except TypeError:
+                break
+            keys.append(prefix)
+        if keys:
+            self._keys[doc_id] = keys
+
+    def remove(self, doc_id):
+        for key in self._keys.pop(doc_id, []):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(doc_id, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, values):
+        return self._buckets.get(tuple(values), {})
+
+class _MaxId:
+    """Sentinel that sorts after every document ID, for bisecting past equal keys."""
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+_MAX_ID = _MaxId()
+
+class MockSortedIndex:
+    """Index keeping one field's (value, document id) pairs in Firestore order for ordered and range reads."""
+    def __init__(self, field):
+        self.field = field
+        self._entries = []  # sorted (sort key, document id) pairs
+        self._keys = {}     # document id -> sort key
+
+    def add(self, doc_id, data):
+        self.remove(doc_id)
+        if self.field not in data:
+            return
+        key = _sort_key(data[self.field])
+        bisect.insort(self._entries, (key, doc_id))
+        self._keys[doc_id] = key
+
+    def remove(self, doc_id):
+        key = self._keys.pop(doc_id, None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self._entries, (key, doc_id))
+        if position < len(self._entries) and self._entries[position] == (key, doc_id):
+            del self._entries[position]
+
+    def scan(self, ranges=(), descending=False, cursor=None):
+        """Yield document ids in order, limited to the given (op, value) ranges and after a (value, id) cursor."""
+        entries = self._entries
+        low, high = 0, len(entries)
+        for op, value in ranges:
+            key = _sort_key(value)
+            if op in ('>', '>=', '<', '<='):
+                # Range filters only match values of the same type
+                low = max(low, bisect.bisect_left(entries, ((key[0],),)))
+                high = min(high, bisect.bisect_left(entries, ((key[0] + 1,),)))
+            if op in ('>=', '=='):
+                low = max(low, bisect.bisect_left(entries, (key,)))
+            if op in ('>',):
+                low = max(low, bisect.bisect_right(entries, (key, _MAX_ID)))
+            if op in ('<=', '=='):
+                high = min(high, bisect.bisect_right(entries, (key, _MAX_ID)))
+            if op in ('<',):
+                high = min(high, bisect.bisect_left(entries, (key,)))
+        
+        if cursor is not None:
+            key = _sort_key(cursor[0])
+            cursor_id = cursor[1]
+            if descending:
+                high = min(high, bisect.bisect_left(entries, (key, cursor_id) if cursor_id is not None else (key,)))
+            else:
+                low = max(low, bisect.bisect_right(entries, (key, cursor_id if cursor_id is not None else _MAX_ID)))
+        
+        positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+        for position in positions:
+            yield entries[position][1]
+
+# Composite indexes declared per collection, matched against equality filters
+COMPOSITE_INDEXES = {
+    'users': [
+        ('role', 'available', 'blood_group'),
+    ],
+    'blood_requests': [
+        ('status', 'blood_group'),
+        ('status', 'created_at'),
+        ('user_id', 'created_at'),
+    ],
+    'donations': [
+        ('donor_id', 'donation_date'),
+        ('blood_group', 'donation_date'),
+    ],
+}
+
+def add_composite_index(collection_name, fields):
+    """Declare a composite index; it is built the next time a query can use it."""
+    fields = tuple(fields)
+    declared = COMPOSITE_INDEXES.setdefault(collection_name, [])
+    if fields not in declared:
+        declared.append(fields)
+
+def _best_composite_index(collection_name, equality_fields):
+    """Pick the declared composite index whose longest prefix is covered by the given fields."""
+    best_fields, best_length = None, 0
+    for fields in COMPOSITE_INDEXES.get(collection_name, []):
+        length = 0
+        for field in fields:
+            if field not in equality_fields:
+                break
+            length += 1
+        if length > best_length:
+            best_fields, best_length = fields, length
+    return best_fields, best_length
+
+class MockIndexManager:
+    """Hash and composite indexes for one collection, built on first query and kept current on writes."""
+    def __init__(self, collection_name=None, unique_fields=()):
+        self.collection_name = collection_name
+        self._indexes = {}
+        self._composites = {}
+        self._sorted = {}
+        # Unique indexes enforce a constraint, so they are kept from the first write
+        self._unique = {field: MockUniqueIndex(field) for field in unique_fields}
+        # Indexes are built lazily by readers, so creation needs its own lock
+        self._build_lock = threading.Lock()
+
+    def get_index(self, field, collection_data):
+        index = self._indexes.get(field)
+        if index is None:
+            with self._build_lock:
+                index = self._indexes.get(field)
+                if index is None:
+                    index = MockHashIndex(field)
+                    for doc_id, data in collection_data.items():
+                        index.add(doc_id, data)
+                    self._indexes[field] = index
+        return index
+
+    def get_composite_index(self, fields, collection_data):
+        fields = tuple(fields)
+        index = self._composites.get(fields)
+        if index is None:
+            with self._build_lock:
+                index = self._composites.get(fields)
+                if index is None:
+                    index = MockCompositeIndex(fields)
+                    for doc_id, data in collection_data.items():
+                        index.add(doc_id, data)
+                    self._composites[fields] = index
+        return index
+
+    def get_sorted_index(self, field, collection_data):
+        index = self._sorted.get(field)
+        if index is None:
+            with self._build_lock:
+                index = self._sorted.get(field)
+                if index is None:
+                    index = MockSortedIndex(field)
+                    for doc_id, data in collection_data.items():
+                        index.add(doc_id, data)
+                    self._sorted[field] = index
+        return index
+
+    def best_composite(self, equality_fields):
+        return _best_composite_index(self.collection_name, equality_fields)
+
+    def get_unique_index(self, field):
+        return self._unique.get(field)
+
+    def update_document(self, doc_id, data):
+        for index in self._unique.values():
+            index.add(doc_id, data)
+        for index in self._indexes.values():
+            index.add(doc_id, data)
+        for index in self._composites.values():
+            index.add(doc_id, data)
+        for index in self._sorted.values():
+            index.add(doc_id, data)
+
+    def remove_document(self, doc_id):
+        for index in self._unique.values():
+            index.remove(doc_id)
+        for index in self._indexes.values():
+            index.remove(doc_id)
+        for index in self._composites.values():
+            index.remove(doc_id)
+        for index in self._sorted.values():
+            index.remove(doc_id)
+
+# Fields that must be unique within a top-level collection, compared case-insensitively
+UNIQUE_INDEXES = {
+    'users': ('email',),
+}
+
+class UniqueConstraintError(ValueError):
+    """Raised when a write would give two documents the same value of a unique field."""
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def _normalize_unique(value):
+    """Case-normalise a unique field value the way SQLite's lower(trim(value)) does; non-strings are not indexed."""
+    return value.strip(' ').translate(_ASCII_LOWER) if isinstance(value, str) else None
+
+class MockUniqueIndex:
+    """Maps the normalised value of a unique field to the one document holding it."""
+    def __init__(self, field):
+        self.field = field
+        self._ids = {}     # normalised value -> doc_id
+        self._values = {}  # doc_id -> normalised value
+
+    def lookup(self, value):
+        return self._ids.get(_normalize_unique(value))
+
+    def add(self, doc_id, data):
+        self.remove(doc_id)
+        key = _normalize_unique(data.get(self.field))
+        if key is not None:
+            self._ids[key] = doc_id
+            self._values[doc_id] = key
+
+    def remove(self, doc_id):
+        key = self._values.pop(doc_id, None)
+        if key is not None and self._ids.get(key) == doc_id:
+            del self._ids[key]
+
+class MockBloomFilter:
+    """Bloom filter: a value that was never added is almost always reported absent, an added one never is."""
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing from one digest gives all the bit positions
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+# Collections whose documents carry a version number, bumped on every write, for read-through caches
+VERSIONED_COLLECTIONS = ('inventory',)
+
+def _is_versioned(path):
+    return path.split('/')[-1] in VERSIONED_COLLECTIONS
+
+# Fields whose values are counted per collection, kept current on every write
+AGGREGATE_FIELDS = {
+    'blood_requests': ('status', 'blood_group'),
+    'notifications': ('read',),
+    'donations': ('blood_group',),
+}
+
+def _aggregate_fields(path):
+    return AGGREGATE_FIELDS.get(path.split('/')[-1])
+
+def _aggregate_values(fields, data):
+    """The (field, value) pairs of a document that are counted; only scalar values are counted."""
+    return tuple((field, data[field]) for field in fields
+                 if field in data and isinstance(data[field], (str, int, float, bool, type(None))))
+
+def _empty_aggregate(fields):
+    return {'total': 0, 'counts': {field: {} for field in fields}}
+
+class MockAggregates:
+    """Document counts for one collection, in total and per field value, updated in O(1) per write."""
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.total = 0
+        self.counts = {field: {} for field in self.fields}
+        self._values = {}  # doc_id -> counted (field, value) pairs
+
+    def update_document(self, doc_id, data):
+        values = _aggregate_values(self.fields, data)
+        if self._values.get(doc_id) == values:
+            return
+        self.remove_document(doc_id)
+        self._values[doc_id] = values
+        self.total += 1
+        for field, value in values:
+            counts = self.counts[field]
+            counts[value] = counts.get(value, 0) + 1
+
+    def remove_document(self, doc_id):
+        values = self._values.pop(doc_id, None)
+        if values is None:
+            return
+        self.total -= 1
+        for field, value in values:
+            counts = self.counts[field]
+            counts[value] -= 1
+            if not counts[value]:
+                del counts[value]
+
+    def snapshot(self):
+        return {'total': self.total, 'counts': {field: dict(counts) for field, counts in self.counts.items()}}
+
+# Most recent writes kept for MockChangeLog.since()
+CHANGE_LOG_SIZE = 10000
+
+class MockDocumentChange:
+    """One change passed to an on_snapshot callback; type is ADDED, MODIFIED or REMOVED."""
+    ADDED = 'ADDED'
+    MODIFIED = 'MODIFIED'
+    REMOVED = 'REMOVED'
+
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+class MockWatch:
+    """Listener registered by on_snapshot; call unsubscribe() to stop receiving snapshots.
+    
+    The callback is called from a background thread as callback(snapshots, changes,
+    read_time): first with every matching document as ADDED, then whenever
+    matching documents are added, modified or removed.
+    """
+    def __init__(self, store, path, callback, doc_id=None, filters=(), orders=(), limit=None,
+                 offset=0, cursor=None, projection=None):
+        self.store = store
+        self.path = path
+        self.callback = callback
+        self.doc_id = doc_id
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.limit = limit
+        self.offset = offset
+        self.cursor = cursor
+        self.projection = projection
+        self.active = True
+        self._docs = {}  # doc_id -> data of the current snapshot
+        # Ordered or paged results cannot be updated one document at a time
+        self._requery = bool(_effective_orders(self.filters, self.orders) or limit is not None
+                             or offset or cursor is not None)
+
+    def unsubscribe(self):
+        self.active = False
+        self.store.changes.unsubscribe(self)
+
+    def _load(self):
+        if self.doc_id is not None:
+            data = self.store.get_document(self.path, self.doc_id)
+            self._docs = {self.doc_id: data} if data is not None else {}
+        else:
+            self._docs = dict(self.store.query(self.path, self.filters, self.orders,
+                                               self.limit, self.offset, self.cursor))
+        changes = [MockDocumentChange(MockDocumentChange.ADDED, self._snapshot(doc_id, data))
+                   for doc_id, data in self._docs.items()]
+        self._notify(changes, initial=True)
+
+    def _apply(self, doc_ids):
+        """Bring the snapshot up to date with documents that were written."""
+        changes = []
+        if self._requery:
+            previous = self._docs
+            self._docs = dict(self.store.query(self.path, self.filters, self.orders,
+                                               self.limit, self.offset, self.cursor))
+            for doc_id, data in self._docs.items():
+                if doc_id not in previous:
+                    changes.append(MockDocumentChange(MockDocumentChange.ADDED, self._snapshot(doc_id, data)))
+                elif doc_id in doc_ids:
+                    changes.append(MockDocumentChange(MockDocumentChange.MODIFIED, self._snapshot(doc_id, data)))
+            for doc_id, data in previous.items():
+                if doc_id not in self._docs:
+                    changes.append(MockDocumentChange(MockDocumentChange.REMOVED, self._snapshot(doc_id, data)))
+        else:
+            for doc_id in doc_ids:
+                data = self.store.get_document(self.path, doc_id)
+                if data is not None and _matches_filters(data, self.filters):
+                    change_type = MockDocumentChange.MODIFIED if doc_id in self._docs else MockDocumentChange.ADDED
+                    self._docs[doc_id] = data
+                    changes.append(MockDocumentChange(change_type, self._snapshot(doc_id, data)))
+                elif doc_id in self._docs:
+                    data = self._docs.pop(doc_id)
+                    changes.append(MockDocumentChange(MockDocumentChange.REMOVED, self._snapshot(doc_id, data)))
+        self._notify(changes)
+
+    def _snapshot(self, doc_id, data):
+        return MockDocumentSnapshot(doc_id, _project(data, self.projection) if self.projection is not None else data)
+
+    def _notify(self, changes, initial=False):
+        if not self.active or not (changes or initial):
+            return
+        snapshots = [self._snapshot(doc_id, data) for doc_id, data in self._docs.items()]
+        try:
+            self.callback(snapshots, changes, datetime.now())
+        except Exception as e:
+            logger.error("Error in on_snapshot callback: %s", e)
+
+class MockChangeLog:
+    """Sequence-numbered log of document writes that feeds on_snapshot listeners.
+    
+    Only (sequence, path, doc_id) is logged. Listeners read the current data when a
+    change is delivered, so quick successive writes may arrive as one change, and a
+    document already in a new listener's first snapshot may also arrive as MODIFIED.
+    """
+    def __init__(self, size=CHANGE_LOG_SIZE):
+        self.sequence = 0
+        self._entries = deque(maxlen=size)
+        self._generations = {}  # collection path -> number of writes
+        self._watches = {}  # collection path -> [MockWatch]
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._dispatcher = None
+
+    def record(self, path, doc_id):
+        with self._lock:
+            self.sequence += 1
+            self._entries.append((self.sequence, path, doc_id))
+            self._generations[path] = self._generations.get(path, 0) + 1
+            if path in self._watches:
+                self._queue.put((path, doc_id))
+
+    def generation(self, path):
+        """Number of writes this process recorded for a collection path."""
+        return self._generations.get(path, 0)
+
+    def since(self, sequence):
+        """(sequence, path, doc_id) entries after a sequence number, or None if the log no longer reaches back that far."""
+        with self._lock:
+            if self._entries and sequence < self._entries[0][0] - 1:
+                return None
+            return [entry for entry in self._entries if entry[0] > sequence]
+
+    def watch(self, watch):
+        with self._lock:
+            self._watches.setdefault(watch.path, []).append(watch)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="change-dispatcher", daemon=True)
+                self._dispatcher.start()
+            # The first snapshot is loaded on the dispatcher thread, ahead of later changes
+            self._queue.put((None, watch))
+        return watch
+
+    def unsubscribe(self, watch):
+        with self._lock:
+            watches = self._watches.get(watch.path, [])
+            if watch in watches:
+                watches.remove(watch)
+            if not watches:
+                self._watches.pop(watch.path, None)
+
+    def _dispatch(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # Changed documents are grouped per collection; first loads keep their place
+            try:
+                changed = {}
+                for path, item in items:
+                    if path is None:
+                        self._deliver(changed)
+                        changed = {}
+                        item._load()
+                    else:
+                        changed.setdefault(path, {})[item] = None
+                self._deliver(changed)
+            except Exception as e:
+                logger.error("Error in change dispatch: %s", e)
+
+    def _deliver(self, changed):
+        for path, doc_ids in changed.items():
+            with self._lock:
+                watches = list(self._watches.get(path, []))
+            for watch in watches:
+                if watch.doc_id is None:
+                    watch._apply(doc_ids)
+                elif watch.doc_id in doc_ids:
+                    watch._apply([watch.doc_id])
+
+# Most query results kept by the query cache; 0 turns the cache off
+QUERY_CACHE_SIZE = int(os.environ.get('DONORLINK_QUERY_CACHE_SIZE', '512'))
+
+def _freeze(value):
+    """Turn a query parameter into something hashable for a cache key."""
+    value = _unwrap(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, ArrayLength):
+        return ('ArrayLength', value.field, value.alias)
+    return value
+
+class MockQueryCache:
+    """LRU cache of query results, each tagged with its collection's generation.
+    
+    An entry is only used while the generation it was loaded at is still current,
+    so any write to the collection invalidates its cached queries.
+    """
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (generation, results)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, generation):
+        """Cached results for a key at the given generation, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, results):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+_query_cache = MockQueryCache()
+
+class MockReadWriteLock:
+    """Reader-writer lock: many concurrent readers or a single writer, with writers preferred."""
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read_lock(self):
+        # Nested reads, and reads by the thread holding the write lock, re-enter freely
+        depth = getattr(self._local, 'depth', 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+        
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+QUERY_OPERATORS = ('==', '<', '<=', '>', '>=', 'in', 'array_contains')
+
+# Documents checked per read-lock acquisition while streaming from the in-memory store
+STREAM_CHUNK_SIZE = 256
+_RANGE_OPERATORS = ('<', '<=', '>', '>=')
+
+def _sort_key(value):
+    """Order values across types like Firestore: null, booleans, numbers, strings, then everything else."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, json.dumps(value, sort_keys=True, default=str))
+
+def _is_descending(direction):
+    return str(direction).lower() in ('desc', 'descending')
+
+def _compare(current, op, value):
+    """Evaluate one filter operator against a stored field value."""
+    if op == '==':
+        return current == value
+    if op == 'in':
+        return current in value
+    if op == 'array_contains':
+        return isinstance(current, list) and value in current
+    
+    # Range filters only match values of the same type
+    current, value = _sort_key(current), _sort_key(value)
+    if current[0] != value[0]:
+        return False
+    if op == '<':
+        return current < value
+    if op == '<=':
+        return current <= value
+    if op == '>':
+        return current > value
+    return current >= value
+
+def _matches_filters(data, filters):
+    """Check a document against query filters; documents missing a filtered field never match."""
+    for field, op, value in filters:
+        if field not in data or not _compare(data[field], op, value):
+            return False
+    return True
+
+def _effective_orders(filters, orders):
+    """Order by the requested fields, or implicitly by the first range-filtered field."""
+    if orders:
+        return list(orders)
+    for field, op, value in filters:
+        if op in _RANGE_OPERATORS:
+            return [(field, None)]
+    return []
+
+def _sort_documents(doc_ids, docs, orders):
+    """Order document ids by the order fields (then by id), dropping documents missing any of them."""
+    rows = [(doc_id, docs[doc_id]) for doc_id in doc_ids
+            if doc_id in docs and all(field in docs[doc_id] for field, _ in orders)]
+    rows.sort(key=lambda row: row[0], reverse=bool(orders) and _is_descending(orders[-1][1]))
+    for field, direction in reversed(orders):
+        rows.sort(key=lambda row: _sort_key(row[1][field]), reverse=_is_descending(direction))
+    return [doc_id for doc_id, _ in rows]
+
+def _cursor_values(cursor, orders):
+    """Split a start_after cursor (snapshot, field map or value list) into order values and a document id."""
+    if hasattr(cursor, 'to_dict'):
+        data = _unwrap(cursor.to_dict() or {})
+        return [data.get(field) for field, _ in orders], cursor.id
+    if isinstance(cursor, Mapping):
+        cursor = _unwrap(cursor)
+        return [cursor.get(field) for field, _ in orders], None
+    return list(cursor), None
+
+def _after_cursor(data, doc_id, orders, cursor_values, cursor_id):
+    for (field, direction), bound in zip(orders, cursor_values):
+        current, bound = _sort_key(data.get(field)), _sort_key(bound)
+        if current != bound:
+            return current < bound if _is_descending(direction) else current > bound
+    if cursor_id is None or len(cursor_values) < len(orders):
+        return False
+    if orders and _is_descending(orders[-1][1]):
+        return doc_id < cursor_id
+    return doc_id > cursor_id
+
+def _iter_results(rows, filters, orders=(), limit=None, offset=0, cursor=None):
+    """Filter ordered (doc_id, data) rows, then apply the start_after cursor, offset and limit."""
+    if cursor is not None:
+        cursor_values, cursor_id = _cursor_values(cursor, orders)
+    
+    returned = 0
+    skipped = 0
+    for doc_id, data in rows:
+        if limit is not None and returned >= limit:
+            break
+        if data is None or not _matches_filters(data, filters):
+            continue
+        if cursor is not None and not _after_cursor(data, doc_id, orders, cursor_values, cursor_id):
+            continue
+        if skipped < offset:
+            skipped += 1
+            continue
+        returned += 1
+        yield doc_id, data
+
+class ArrayLength:
+    """Projected field holding the length of an array field, named `<field>_count` by default."""
+    def __init__(self, field, alias=None):
+        self.field = field
+        self.alias = alias or f"{field}_count"
+
+def _project(data, projection):
+    """Copy only the selected fields of a document; missing fields are left out."""
+    result = {}
+    for item in projection:
+        if isinstance(item, ArrayLength):
+            value = data.get(item.field)
+            result[item.alias] = len(value) if isinstance(value, list) else 0
+        elif item in data:
+            result[item] = data[item]
+    return result
+
+def _project_rows(rows, projection):
+    """Apply a projection to (doc_id, data) rows, or pass them through when there is none."""
+    if projection is None:
+        return rows
+    return ((doc_id, _project(data, projection)) for doc_id, data in rows)
+
+class MockDictView(Mapping):
+    """Read-only view of a stored document or map field.
+    
+    Nested maps and arrays come back as views too, so nothing reached through
+    to_dict() can change the store. Use copy() to get a mutable dict.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return _view(self._data[key])
+
+    def get(self, key, default=None):
+        if key in self._data:
+            return _view(self._data[key])
+        return default
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        return self._data == _unwrap(other)
+
+    def __repr__(self):
+        return repr(self._data)
+
+    def copy(self):
+        """Return a mutable deep copy."""
+        return _thaw(self._data)
+
+class MockListView(Sequence):
+    """Read-only view of a stored array field; see MockDictView."""
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MockListView(self._data[index])
+        return _view(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, value):
+        return _unwrap(value) in self._data
+
+    def __eq__(self, other):
+        return self._data == _unwrap(other)
+
+    def __repr__(self):
+        return repr(self._data)
+
+    def copy(self):
+        """Return a mutable deep copy."""
+        return _thaw(self._data)
+
+def _view(value):
+    """Wrap stored containers in read-only views; other values are returned as they are."""
+    if isinstance(value, dict):
+        return MockDictView(value)
+    if isinstance(value, list):
+        return MockListView(value)
+    return value
+
+def _unwrap(value):
+    """The stored object behind a view, without copying it."""
+    if isinstance(value, (MockDictView, MockListView)):
+        return value._data
+    return value
+
+def _thaw(value):
+    """Deep copy a value into plain dicts and lists, so the store never shares a caller's containers."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in _unwrap(value).items()}
+    if isinstance(value, (list, tuple, MockListView)):
+        return [_thaw(item) for item in _unwrap(value)]
+    return value
+
+class FieldTransform:
+    """Base class for values that are computed from the stored field when a write is applied."""
+    def apply(self, current):
+        raise NotImplementedError
+
+class Increment(FieldTransform):
+    """Add a number to a field; missing or non-numeric fields count as zero."""
+    def __init__(self, value):
+        self.value = value
+
+    def apply(self, current):
+        if isinstance(current, bool) or not isinstance(current, (int, float)):
+            current = 0
+        return current + self.value
+
+class ArrayUnion(FieldTransform):
+    """Append values that are not already present to an array field."""
+    def __init__(self, values):
+        self.values = _thaw(list(values))
+
+    def apply(self, current):
+        # Copy so views handed out for the old document stay unchanged
+        current = list(current) if isinstance(current, list) else []
+        for value in self.values:
+            if value not in current:
+                current.append(value)
+        return current
+
+def _merge_fields(stored, data):
+    """Write fields into a stored document, resolving field transforms against it."""
+    for field, value in data.items():
+        if isinstance(value, FieldTransform):
+            stored[field] = value.apply(stored.get(field))
+        else:
+            stored[field] = _thaw(value)
+    return stored
+
+def _apply_write(store, op, path, doc_id, data):
+    """Apply one buffered write to a store, returning the stored data (None for deletes)."""
+    if op == 'delete':
+        store.delete_document(path, doc_id)
+        return None
+    return store.set_document(path, doc_id, data, merge=(op == 'update'))
+
+class MockDataStore:
+    """Process-wide in-memory document store shared by all sessions.
+    
+    Documents are kept per collection path ('users', 'users/<id>/notifications')
+    together with their indexes. Reads share the lock, writes take it exclusively.
+    """
+    def __init__(self):
+        self.lock = MockReadWriteLock()
+        self._collections = {}  # collection path -> {doc_id: data}
+        self._indexes = {}      # collection path -> MockIndexManager
+        self._aggregates = {}   # collection path -> MockAggregates
+        self._versions = {}     # (path, doc_id) -> version, for VERSIONED_COLLECTIONS
+        self.changes = MockChangeLog()
+
+    def _index_manager(self, path):
+        manager = self._indexes.get(path)
+        if manager is None:
+            manager = self._indexes.setdefault(
+                path, MockIndexManager(path.split('/')[-1], UNIQUE_INDEXES.get(path, ())))
+        return manager
+
+    def _aggregate_counter(self, path):
+        # Only called with the write lock held
+        counter = self._aggregates.get(path)
+        if counter is None:
+            fields = _aggregate_fields(path)
+            if fields is None:
+                return None
+            counter = self._aggregates[path] = MockAggregates(fields)
+        return counter
+
+    def get_document(self, path, doc_id):
+        with self.lock.read_lock():
+            return self._collections.get(path, {}).get(doc_id)
+
+    def _check_unique(self, writes):
+        """Reject (op, path, doc_id, data) writes that would give two documents the same unique value."""
+        claimed = {}
+        for op, path, doc_id, data in writes:
+            if op == 'delete':
+                continue
+            for field in UNIQUE_INDEXES.get(path, ()):
+                key = _normalize_unique(data.get(field))
+                if key is None:
+                    continue
+                owner = claimed.get((path, field, key)) or self._index_manager(path).get_unique_index(field).lookup(key)
+                if owner is not None and owner != doc_id:
+                    raise UniqueConstraintError(f"Unique field '{field}' already in use in {path}: {data[field]}")
+                claimed[(path, field, key)] = doc_id
+
+    def set_document(self, path, doc_id, data, merge=False):
+        with self.lock.write_lock():
+            self._check_unique([('set', path, doc_id, data)])
+            # Copy on write: documents already handed out as views are never changed
+            stored = self._collections.get(path, {}).get(doc_id)
+            return self._install(path, doc_id, _merge_fields(dict(stored) if merge and stored else {}, data))
+
+    def _install(self, path, doc_id, stored):
+        """Store resolved document data and update indexes, aggregates and the change log."""
+        with self.lock.write_lock():
+            self._collections.setdefault(path, {})[doc_id] = stored
+            self._index_manager(path).update_document(doc_id, stored)
+            counter = self._aggregate_counter(path)
+            if counter is not None:
+                counter.update_document(doc_id, stored)
+            if _is_versioned(path):
+                self._versions[(path, doc_id)] = self._versions.get((path, doc_id), 0) + 1
+            self.changes.record(path, doc_id)
+            return stored
+
+    def update_document(self, path, doc_id, data):
+        # Like Firestore's update, but creates missing documents as the mock always has
+        return self.set_document(path, doc_id, data, merge=True)
+
+    def generation(self, path):
+        """Number of writes to a collection path; it changes whenever the collection does."""
+        # The store only lives in this process, so the change log sees every write
+        return self.changes.generation(path)
+
+    def delete_document(self, path, doc_id):
+        with self.lock.write_lock():
+            if self._collections.get(path, {}).pop(doc_id, None) is not None:
+                self._index_manager(path).remove_document(doc_id)
+                counter = self._aggregate_counter(path)
+                if counter is not None:
+                    counter.remove_document(doc_id)
+                if _is_versioned(path):
+                    self._versions[(path, doc_id)] = self._versions.get((path, doc_id), 0) + 1
+                self.changes.record(path, doc_id)
+
+    def apply_writes(self, writes):
+        """Apply (op, path, doc_id, data) writes under a single write lock acquisition."""
+        with self.lock.write_lock():
+            # Check the whole batch first so a conflict leaves nothing half applied
+            self._check_unique(writes)
+            
+            # Resolve every write into new document data before installing any of it, so a
+            # failing field transform leaves the store untouched; later writes to the same
+            # document build on the earlier ones
+            pending = {}
+            resolved = []
+            for op, path, doc_id, data in writes:
+                if op == 'delete':
+                    stored = None
+                else:
+                    current = pending[(path, doc_id)] if (path, doc_id) in pending else \
+                        self._collections.get(path, {}).get(doc_id)
+                    stored = _merge_fields(dict(current) if op == 'update' and current else {}, data)
+                pending[(path, doc_id)] = stored
+                resolved.append((path, doc_id, stored))
+            
+            for path, doc_id, stored in resolved:
+                if stored is None:
+                    self.delete_document(path, doc_id)
+                else:
+                    self._install(path, doc_id, stored)
+            return [stored for _, _, stored in resolved]
+
+    def list_documents(self, path):
+        with self.lock.read_lock():
+            return list(self._collections.get(path, {}).items())
+
+    def document_version(self, path, doc_id):
+        """Number of writes to a document in VERSIONED_COLLECTIONS; it changes whenever the document does."""
+        if not _is_versioned(path):
+            raise ValueError(f"Documents in {path} are not versioned")
+        with self.lock.read_lock():
+            return self._versions.get((path, doc_id), 0)
+
+    def lookup_unique(self, path, field, value):
+        """Find the (doc_id, data) holding a unique field value, ignoring case; None if there is none."""
+        if field not in UNIQUE_INDEXES.get(path, ()):
+            raise ValueError(f"No unique index on {path}.{field}")
+        with self.lock.read_lock():
+            doc_id = self._index_manager(path).get_unique_index(field).lookup(value)
+            if doc_id is None:
+                return None
+            return doc_id, self._collections[path][doc_id]
+
+    def may_contain_unique(self, path, field, value):
+        """False when no document holds the unique value; the in-memory index answers exactly."""
+        return self.lookup_unique(path, field, value) is not None
+
+    def aggregate(self, path):
+        """Return {'total': n, 'counts': {field: {value: n}}} for a collection in AGGREGATE_FIELDS."""
+        fields = _aggregate_fields(path)
+        if fields is None:
+            raise ValueError(f"No aggregates are kept for collection: {path}")
+        with self.lock.read_lock():
+            counter = self._aggregates.get(path)
+            return counter.snapshot() if counter is not None else _empty_aggregate(fields)
+
+    def query(self, path, filters, orders=(), limit=None, offset=0, cursor=None, projection=None):
+        with self.lock.read_lock():
+            docs = self._collections.get(path, {})
+            plan, candidate_ids = self._plan(path, docs, filters, orders, cursor)
+            
+            # Only filters the indexes could not answer are checked per document
+            rows = ((doc_id, docs.get(doc_id)) for doc_id in candidate_ids)
+            results = _iter_results(rows, plan['residual_filters'],
+                                    _effective_orders(filters, orders), limit, offset, cursor)
+            return list(_project_rows(results, projection))
+
+    def stream(self, path, filters=(), orders=(), limit=None, offset=0, cursor=None, projection=None):
+        """Yield (doc_id, data) pairs lazily instead of building the whole result list."""
+        if limit is not None:
+            yield from self.query(path, filters, orders, limit, offset, cursor, projection)
+            return
+        
+        # Copy only the ordered candidate ids under the lock, then check and
+        # yield the documents in small chunks so writers are not held off
+        with self.lock.read_lock():
+            docs = self._collections.get(path, {})
+            plan, candidate_ids = self._plan(path, docs, filters, orders, cursor)
+            candidate_ids = list(candidate_ids)
+        
+        rows = ((doc_id, docs.get(doc_id)) for doc_id in candidate_ids)
+        results = _project_rows(_iter_results(rows, plan['residual_filters'],
+                                              _effective_orders(filters, orders), None, offset, cursor),
+                                projection)
+        while True:
+            with self.lock.read_lock():
+                chunk = list(itertools.islice(results, STREAM_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield from chunk
+
+    def explain(self, path, filters, orders=(), limit=None, offset=0, cursor=None):
+        with self.lock.read_lock():
+            plan, candidate_ids = self._plan(path, self._collections.get(path, {}), filters, orders, cursor)
+            plan['candidates'] = sum(1 for _ in candidate_ids)
+            plan['limit'] = limit
+            return plan
+
+    def _plan(self, path, docs, filters, orders=(), cursor=None):
+        indexes = self._index_manager(path)
+        
+        # Equality filters on hashable values can be answered by an index
+        equality = {}
+        residual = []
+        unique = None
+        for field, op, value in filters:
+            if (op == '==' and unique is None and indexes.get_unique_index(field) is not None
+                    and isinstance(value, str)):
+                # A unique index leaves at most one candidate; the exact value is still checked
+                unique = (field, value)
+                residual.append((field, op, value))
+            elif op == '==' and field not in equality:
+                try:
+                    hash(value)
+                except TypeError:
+                    residual.append((field, op, value))
+                    continue
+                equality[field] = value
+            else:
+                residual.append((field, op, value))
+        
+        plan = {
+            'collection': path,
+            'strategy': 'scan',
+            'indexes': [],
+            'residual_filters': residual,
+            'order': None
         }
         
-        # Create sample admin user
-        admin_id = str(uuid.uuid4())
-        st.session_state.mock_db['users'][admin_id] = {
-            'id': admin_id,
-            'name': 'Admin User',
-            'email': 'admin@bloodbank.com',
-            'role': 'admin',
-            'phone': '555-123-4567',
-            'address': '123 Hospital St',
-            'city': 'Medical City',
-            'created_at': datetime.now().isoformat()
+        candidate_ids = None
+        if unique is not None:
+            field, value = unique
+            doc_id = indexes.get_unique_index(field).lookup(value)
+            candidate_ids = [doc_id] if doc_id is not None and doc_id in docs else []
+            residual.extend((name, '==', value) for name, value in equality.items())
+            plan['strategy'] = 'unique_index'
+            plan['indexes'].append(f"{path}(unique {field})")
+        elif equality:
+            buckets = []
+            remaining = dict(equality)
+            
+            # Prefer a composite index covering two or more of the filters
+            fields, length = indexes.best_composite(equality)
+            if length >= 2:
+                covered = fields[:length]
+                index = indexes.get_composite_index(fields, docs)
+                buckets.append(index.lookup([equality[field] for field in covered]))
+                for field in covered:
+                    remaining.pop(field)
+                plan['strategy'] = 'composite_index'
+                plan['indexes'].append(f"{path}({', '.join(fields)})")
+            else:
+                plan['strategy'] = 'hash_index'
+            
+            # Intersect with single-field hash indexes for anything left over
+            for field, value in remaining.items():
+                buckets.append(indexes.get_index(field, docs).lookup(value))
+                plan['indexes'].append(f"{path}({field})")
+            
+            if len(buckets) == 1:
+                candidate_ids = list(buckets[0])
+            else:
+                buckets.sort(key=len)
+                smallest, others = buckets[0], buckets[1:]
+                candidate_ids = [doc_id for doc_id in smallest if all(doc_id in bucket for bucket in others)]
+        
+        orders = _effective_orders(filters, orders)
+        if not orders and cursor is None:
+            return plan, candidate_ids if candidate_ids is not None else list(docs.keys())
+        
+        # Walk a sorted index unless the equality filters already left only a few candidates
+        if len(orders) == 1 and (candidate_ids is None or len(candidate_ids) * 8 > len(docs)):
+            field, direction = orders[0]
+            descending = _is_descending(direction)
+            index = indexes.get_sorted_index(field, docs)
+            ranges = [(op, value) for name, op, value in filters
+                      if name == field and (op in _RANGE_OPERATORS or op == '==')]
+            
+            bound = None
+            if cursor is not None:
+                cursor_values, cursor_id = _cursor_values(cursor, orders)
+                if cursor_values:
+                    bound = (cursor_values[0], cursor_id)
+            
+            ordered_ids = index.scan(ranges, descending, bound)
+            if candidate_ids is not None:
+                members = set(candidate_ids)
+                ordered_ids = (doc_id for doc_id in ordered_ids if doc_id in members)
+            else:
+                plan['strategy'] = 'sorted_index'
+            plan['order'] = 'sorted_index'
+            plan['indexes'].append(f"{path}({field} {'desc' if descending else 'asc'})")
+            return plan, ordered_ids
+        
+        plan['order'] = 'sort'
+        return plan, _sort_documents(candidate_ids if candidate_ids is not None else docs.keys(), docs, orders)
+
+# Field names are inlined into JSON paths, so only plain identifiers are allowed
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+class MockSQLiteStore:
+    """Durable document store kept in a SQLite database in WAL mode.
+    
+    Offers the same interface as MockDataStore. Documents are stored as JSON
+    rows keyed by collection path and ID. Equality filters are compiled to SQL
+    over expression indexes: the declared composite indexes are created up
+    front (or by the first query that can use one declared later), and a
+    single-field index is added the first time a query filters on a field
+    no composite index covers. Counters for AGGREGATE_FIELDS are
+    kept in an aggregates table, updated in the same transaction as the
+    document write; the row with an empty field holds the document count.
+    UNIQUE_INDEXES become partial unique expression indexes, optionally
+    fronted by a Bloom filter so most lookups of unused values skip the index.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        # SQLite allows one writer at a time; serialise writers in-process
+        self._write_lock = threading.RLock()
+        # Only writes made through this store object are seen by listeners
+        self.changes = MockChangeLog()
+        
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (collection, doc_id)
+                )
+            """)
+            self._indexed = {
+                row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'documents'")
+            }
+            for declared in COMPOSITE_INDEXES.values():
+                for fields in declared:
+                    self._ensure_index(fields)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generations (
+                    collection TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+            """)
+            
+            self._blooms = {}
+            for path, fields in UNIQUE_INDEXES.items():
+                for field in fields:
+                    self._ensure_unique_index(path, field)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS aggregates (
+                    collection TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (collection, field, value)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS aggregate_fields (
+                    name TEXT PRIMARY KEY,
+                    fields TEXT NOT NULL
+                )
+            """)
+            for name, fields in AGGREGATE_FIELDS.items():
+                self._ensure_aggregates(name, fields)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS versions (
+                    collection TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    PRIMARY KEY (collection, doc_id)
+                )
+            """)
+
+
+    def _connection(self):
+        # One connection per thread; the sqlite3 module caches prepared statements per connection
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        if self._local.depth:
+            # Already inside a transaction on this thread
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.depth = 1
+            self._local.changed = []
+            try:
+                yield conn
+                # One bump per written collection, committed with the writes
+                for path in {path for path, _ in self._local.changed}:
+                    conn.execute(
+                        "INSERT INTO generations (collection, generation) VALUES (?, 1) "
+                        "ON CONFLICT (collection) DO UPDATE SET generation = generation + 1",
+                        (path,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+                # Listeners only hear about committed writes
+                for path, doc_id in self._local.changed:
+                    self.changes.record(path, doc_id)
+            finally:
+                self._local.depth = 0
+                self._local.changed = []
+
+    def _ensure_index(self, fields):
+        fields = [field for field in fields if _FIELD_NAME.match(field)]
+        if not fields:
+            return
+        name = 'idx_documents_' + '_'.join(fields)
+        if name in self._indexed:
+            return
+        columns = ', '.join(f"json_extract(data, '$.{field}')" for field in fields)
+        with self._write_lock:
+            self._connection().execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON documents (collection, {columns})")
+            self._indexed.add(name)
+
+    def _unique_clause(self, path, field):
+        """WHERE clause matching a normalised unique value; it repeats the partial index's condition."""
+        value = (f"CASE json_type(data, '$.{field}') WHEN 'text' "
+                 f"THEN lower(trim(json_extract(data, '$.{field}'))) END")
+        collection = path.replace("'", "''")
+        return f"collection = '{collection}' AND ({value}) = ?", value, collection
+
+    def _ensure_unique_index(self, path, field):
+        conn = self._connection()
+        clause, value, collection = self._unique_clause(path, field)
+        name = f"idx_documents_unique_{re.sub(r'[^A-Za-z0-9_]', '_', path)}_{field}"
+        try:
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} "
+                         f"ON documents (({value})) WHERE collection = '{collection}'")
+        except sqlite3.IntegrityError:
+            # Existing duplicates predate the constraint; index the values without enforcing it
+            logger.error("Duplicate %s values in %s; the unique index is not enforced", field, path)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_dup "
+                         f"ON documents (({value})) WHERE collection = '{collection}'")
+        
+        if BLOOM_FILTER:
+            rows = conn.execute(f"SELECT {value} FROM documents WHERE collection = '{collection}'").fetchall()
+            # Leave room to grow so the false positive rate stays low
+            bloom = MockBloomFilter(capacity=max(100000, 2 * len(rows)))
+            for (key,) in rows:
+                if key is not None:
+                    bloom.add(key)
+            self._blooms[(path, field)] = bloom
+
+    def _ensure_aggregates(self, name, fields):
+        """Recount a collection's aggregates once when they are new or their fields changed."""
+        conn = self._connection()
+        row = conn.execute("SELECT fields FROM aggregate_fields WHERE name = ?", (name,)).fetchone()
+        if row and json.loads(row[0]) == list(fields):
+            return
+        
+        with self._transaction():
+            rows = conn.execute(
+                "SELECT collection, data FROM documents WHERE collection = ? OR collection GLOB ?",
+                (name, f"*/{name}"))
+            counted = {}
+            for path, raw in rows:
+                counted.setdefault(path, []).append(_aggregate_values(fields, json.loads(raw)))
+            conn.execute("DELETE FROM aggregates WHERE collection = ? OR collection GLOB ?",
+                         (name, f"*/{name}"))
+            for path, documents in counted.items():
+                for values in documents:
+                    self._count(conn, path, values, 1)
+            conn.execute("INSERT OR REPLACE INTO aggregate_fields (name, fields) VALUES (?, ?)",
+                         (name, json.dumps(list(fields))))
+
+    def _count(self, conn, path, values, delta):
+        """Add delta to the document count and to each counted field value."""
+        if values is None:
+            return
+        for field, value in (('', ''),) + tuple((field, json.dumps(value)) for field, value in values):
+            conn.execute(
+                "INSERT INTO aggregates (collection, field, value, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (collection, field, value) DO UPDATE SET count = count + excluded.count",
+                (path, field, value, delta))
+        conn.execute("DELETE FROM aggregates WHERE collection = ? AND count = 0", (path,))
+
+    def get_document(self, path, doc_id):
+        row = self._connection().execute(
+            "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (path, doc_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_document(self, path, doc_id, data, merge=False):
+        with self._transaction() as conn:
+            fields = _aggregate_fields(path)
+            previous = self.get_document(path, doc_id) if merge or fields else None
+            counted = _aggregate_values(fields, previous) if fields and previous is not None else None
+            stored = _merge_fields(previous if merge and previous else {}, data)
+            try:
+                conn.execute(
+                    "INSERT INTO documents (collection, doc_id, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (collection, doc_id) DO UPDATE SET data = excluded.data",
+                    (path, doc_id, json.dumps(stored, default=str)))
+            except sqlite3.IntegrityError:
+                field = next((field for field in UNIQUE_INDEXES.get(path, ()) if field in data), None)
+                raise UniqueConstraintError(f"Unique field '{field}' already in use in {path}: {data.get(field)}")
+            self._local.changed.append((path, doc_id))
+            if _is_versioned(path):
+                self._bump_version(conn, path, doc_id)
+            for field in UNIQUE_INDEXES.get(path, ()):
+                key = _normalize_unique(stored.get(field))
+                if key is not None and (path, field) in self._blooms:
+                    self._blooms[(path, field)].add(key)
+            if fields:
+                values = _aggregate_values(fields, stored)
+                if values != counted:
+                    self._count(conn, path, counted, -1)
+                    self._count(conn, path, values, 1)
+            return stored
+
+    def update_document(self, path, doc_id, data):
+        # Like Firestore's update, but creates missing documents as the mock always has
+        return self.set_document(path, doc_id, data, merge=True)
+
+    def delete_document(self, path, doc_id):
+        with self._transaction() as conn:
+            fields = _aggregate_fields(path)
+            if fields:
+                previous = self.get_document(path, doc_id)
+                self._count(conn, path, _aggregate_values(fields, previous) if previous else None, -1)
+            if conn.execute("DELETE FROM documents WHERE collection = ? AND doc_id = ?", (path, doc_id)).rowcount:
+                self._local.changed.append((path, doc_id))
+                if _is_versioned(path):
+                    self._bump_version(conn, path, doc_id)
+
+    def _bump_version(self, conn, path, doc_id):
+        # Kept in the database so writes from other processes change it too
+        conn.execute(
+            "INSERT INTO versions (collection, doc_id, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (collection, doc_id) DO UPDATE SET version = version + 1",
+            (path, doc_id))
+
+    def generation(self, path):
+        """Number of write transactions to a collection path; it changes whenever the collection does.
+        
+        Kept in the database like document versions, so writes from other processes change it too.
+        """
+        row = self._connection().execute(
+            "SELECT generation FROM generations WHERE collection = ?", (path,)).fetchone()
+        return row[0] if row else 0
+
+    def document_version(self, path, doc_id):
+        """Number of writes to a document in VERSIONED_COLLECTIONS; it changes whenever the document does."""
+        if not _is_versioned(path):
+            raise ValueError(f"Documents in {path} are not versioned")
+        row = self._connection().execute(
+            "SELECT version FROM versions WHERE collection = ? AND doc_id = ?", (path, doc_id)).fetchone()
+        return row[0] if row else 0
+
+    def apply_writes(self, writes):
+        """Apply (op, path, doc_id, data) writes in a single transaction."""
+        with self._transaction():
+            return [_apply_write(self, *write) for write in writes]
+
+    def list_documents(self, path):
+        rows = self._connection().execute(
+            "SELECT doc_id, data FROM documents WHERE collection = ?", (path,))
+        return [(doc_id, json.loads(raw)) for doc_id, raw in rows]
+
+    def lookup_unique(self, path, field, value):
+        """Find the (doc_id, data) holding a unique field value, ignoring case; None if there is none."""
+        if field not in UNIQUE_INDEXES.get(path, ()):
+            raise ValueError(f"No unique index on {path}.{field}")
+        key = _normalize_unique(value)
+        if key is None:
+            return None
+        clause, _, _ = self._unique_clause(path, field)
+        row = self._connection().execute(
+            f"SELECT doc_id, data FROM documents WHERE {clause}", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def may_contain_unique(self, path, field, value):
+        """False when no document holds the unique value; the Bloom filter answers without a query.
+        
+        The filter only learns this process's writes, so a value another process added can
+        be reported as absent. The unique index still rejects the write, with
+        UniqueConstraintError, so this is only good for skipping lookups before a write.
+        """
+        bloom = self._blooms.get((path, field))
+        key = _normalize_unique(value)
+        if bloom is not None and key is not None:
+            return key in bloom
+        return self.lookup_unique(path, field, value) is not None
+
+    def aggregate(self, path):
+        """Return {'total': n, 'counts': {field: {value: n}}} for a collection in AGGREGATE_FIELDS."""
+        fields = _aggregate_fields(path)
+        if fields is None:
+            raise ValueError(f"No aggregates are kept for collection: {path}")
+        result = _empty_aggregate(fields)
+        rows = self._connection().execute(
+            "SELECT field, value, count FROM aggregates WHERE collection = ?", (path,))
+        for field, value, count in rows:
+            if not field:
+                result['total'] = count
+            elif field in result['counts']:
+                result['counts'][field][json.loads(value)] = count
+        return result
+
+    def query(self, path, filters, orders=(), limit=None, offset=0, cursor=None, projection=None):
+        sql, params, residual, paged = self._compile(path, filters, orders, limit, offset, cursor, projection)
+        rows = list(self._decode_rows(self._connection().execute(sql, params), paged, projection))
+        if paged:
+            return rows
+        
+        # Finish filtering, ordering and paging in Python
+        docs = dict(rows)
+        orders = _effective_orders(filters, orders)
+        doc_ids = _sort_documents(docs, docs, orders) if orders or cursor is not None else list(docs)
+        results = _iter_results(((doc_id, docs[doc_id]) for doc_id in doc_ids),
+                                residual, orders, limit, offset, cursor)
+        return list(_project_rows(results, projection))
+
+    def stream(self, path, filters=(), orders=(), limit=None, offset=0, cursor=None, projection=None):
+        """Yield (doc_id, data) pairs straight from the SQLite cursor."""
+        sql, params, residual, paged = self._compile(path, filters, orders, limit, offset, cursor, projection)
+        if not paged and (_effective_orders(filters, orders) or cursor is not None):
+            # Ordering has to happen in Python, which needs every row first
+            yield from self.query(path, filters, orders, limit, offset, cursor, projection)
+            return
+        
+        rows = self._decode_rows(self._connection().execute(sql, params), paged, projection)
+        if paged:
+            yield from rows
+        else:
+            yield from _project_rows(_iter_results(rows, residual, (), limit, offset), projection)
+
+    def _decode_rows(self, rows, paged, projection):
+        """Turn SELECT rows into (doc_id, data) pairs; paged projections arrive as separate columns."""
+        if paged and projection is not None and self._projection_columns(projection) is not None:
+            return ((row[0], self._decode_projection(row[1:], projection)) for row in rows)
+        rows = ((row[0], json.loads(row[1])) for row in rows)
+        # Unpaged rows still need filtering in Python, so they are projected afterwards
+        return _project_rows(rows, projection) if paged else rows
+
+    def _decode_projection(self, values, projection):
+        """Rebuild a projected document from its (json_type, json_extract) column pairs."""
+        result = {}
+        values = iter(values)
+        for item in projection:
+            if isinstance(item, ArrayLength):
+                result[item.alias] = next(values) or 0
+                continue
+            kind, value = next(values), next(values)
+            if kind is None:
+                # Missing fields are left out, like in the Python projection
+                continue
+            if kind in ('array', 'object'):
+                value = json.loads(value)
+            elif kind in ('true', 'false'):
+                value = kind == 'true'
+            result[item] = value
+        return result
+
+    def explain(self, path, filters, orders=(), limit=None, offset=0, cursor=None):
+        sql, params, residual, paged = self._compile(path, filters, orders, limit, offset, cursor)
+        conn = self._connection()
+        details = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        indexes = [name for name in re.findall(r'INDEX (\w+)', ' '.join(details))
+                   if name.startswith('idx_')]
+        return {
+            'collection': path,
+            'strategy': 'sql_index' if indexes else 'scan',
+            'indexes': indexes,
+            'residual_filters': residual,
+            'order': 'sql' if paged and (orders or cursor is not None) else ('sort' if orders else None),
+            'limit': limit,
+            'sql': sql,
+            'plan': details,
+            'candidates': conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
         }
+
+    def _compile(self, path, filters, orders=(), limit=None, offset=0, cursor=None, projection=None):
+        """Build the SELECT for a query; `paged` is False when Python must finish ordering and paging."""
+        clauses = ["collection = ?"]
+        params = [path]
+        residual = []
+        equality = []
+        for field, op, value in filters:
+            unique = op == '==' and field in UNIQUE_INDEXES.get(path, ()) and isinstance(value, str)
+            if unique:
+                # Narrow to the unique index first; the exact comparison below still applies
+                clause, _, _ = self._unique_clause(path, field)
+                clauses.append(clause)
+                params.append(_normalize_unique(value))
+            clause = self._filter_clause(field, op, value, params)
+            if clause is None:
+                residual.append((field, op, value))
+            else:
+                clauses.append(clause)
+                if op == '==' and not unique:
+                    equality.append(field)
+        
+        # Use the best declared composite index, building it if it was declared after
+        # startup; otherwise index the first filtered field
+        if equality:
+            composite, length = _best_composite_index(path.split('/')[-1], set(equality))
+            self._ensure_index(composite if length else (equality[0],))
+        
+        orders = _effective_orders(filters, orders)
+        paged = not residual and all(_FIELD_NAME.match(field) for field, _ in orders)
+        order_sql = ''
+        if paged and (orders or cursor is not None):
+            if cursor is not None:
+                cursor_sql = self._cursor_clause(orders, cursor, params)
+                if cursor_sql is None:
+                    paged = False
+                else:
+                    clauses.append(cursor_sql)
+            if paged:
+                terms = []
+                for field, direction in orders:
+                    # Like Firestore, ordering leaves out documents without the field
+                    clauses.append(f"json_type(data, '$.{field}') IS NOT NULL")
+                    terms.append(f"json_extract(data, '$.{field}') {'DESC' if _is_descending(direction) else 'ASC'}")
+                last_descending = bool(orders) and _is_descending(orders[-1][1])
+                terms.append(f"doc_id {'DESC' if last_descending else 'ASC'}")
+                order_sql = " ORDER BY " + ", ".join(terms)
+                if orders:
+                    self._ensure_index((orders[0][0],))
+        
+        # Fully paged queries read only the projected fields instead of the whole document
+        columns = "data"
+        if paged and projection is not None:
+            columns = self._projection_columns(projection) or columns
+        sql = f"SELECT doc_id, {columns} FROM documents WHERE {' AND '.join(clauses)}{order_sql}"
+        if paged and (limit is not None or offset):
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset])
+        return sql, params, residual, paged
+
+    def _projection_columns(self, projection):
+        """SQL columns for a projection, or None when a field name cannot be inlined."""
+        columns = []
+        for item in projection:
+            field = item.field if isinstance(item, ArrayLength) else item
+            if not _FIELD_NAME.match(field):
+                return None
+            if isinstance(item, ArrayLength):
+                columns.append(f"json_array_length(data, '$.{field}')")
+            else:
+                columns.append(f"json_type(data, '$.{field}'), json_extract(data, '$.{field}')")
+        return ", ".join(columns) or "NULL"
+
+    def _filter_clause(self, field, op, value, params):
+        """Compile one filter to SQL, or return None to check it in Python."""
+        if not _FIELD_NAME.match(field):
+            return None
+        
+        path = f"'$.{field}'"
+        if op == '==':
+            if value is None:
+                return f"json_type(data, {path}) = 'null'"
+            if isinstance(value, (str, int, float)):
+                params.append(value)
+                return f"json_extract(data, {path}) = ?"
+        elif op in _RANGE_OPERATORS:
+            # Range filters only match values of the same type
+            if isinstance(value, str):
+                types = "= 'text'"
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                types = "IN ('integer', 'real')"
+            else:
+                return None
+            params.append(value)
+            return f"json_type(data, {path}) {types} AND json_extract(data, {path}) {op} ?"
+        elif op == 'in':
+            values = list(value) if isinstance(value, (list, tuple, set)) else []
+            if values and all(isinstance(item, (str, int, float)) for item in values):
+                params.extend(values)
+                return f"json_extract(data, {path}) IN ({', '.join('?' * len(values))})"
+        elif op == 'array_contains':
+            if isinstance(value, (str, int, float)):
+                params.append(value)
+                return (f"json_type(data, {path}) = 'array' AND "
+                        f"EXISTS (SELECT 1 FROM json_each(data, {path}) WHERE json_each.value = ?)")
+        return None
+
+    def _cursor_clause(self, orders, cursor, params):
+        """Compile start_after into a keyset condition, or return None to apply it in Python."""
+        values, cursor_id = _cursor_values(cursor, orders)
+        if any(isinstance(value, bool) or not isinstance(value, (str, int, float)) for value in values):
+            return None
+        
+        bounds = [(f"json_extract(data, '$.{field}')", _is_descending(direction), value)
+                  for (field, direction), value in zip(orders, values)]
+        if cursor_id is not None and len(values) >= len(orders):
+            bounds.append(('doc_id', bool(orders) and _is_descending(orders[-1][1]), cursor_id))
+        if not bounds:
+            return None
+        
+        terms = []
+        for position, (expr, descending, value) in enumerate(bounds):
+            parts = []
+            for previous_expr, _, previous_value in bounds[:position]:
+                parts.append(f"{previous_expr} = ?")
+                params.append(previous_value)
+            parts.append(f"{expr} {'<' if descending else '>'} ?")
+            params.append(value)
+            terms.append("(" + " AND ".join(parts) + ")")
+        return "(" + " OR ".join(terms) + ")"
+
+_data_store = None
+_data_store_lock = threading.Lock()
+
+def get_data_store():
+    """Get the process-wide data store, creating and seeding it on first use."""
+    global _data_store
+    if _data_store is None:
+        with _data_store_lock:
+            if _data_store is None:
+                if DB_BACKEND == 'sqlite':
+                    store = MockSQLiteStore(SQLITE_PATH)
+                else:
+                    store = MockDataStore()
+                _seed_data_store(store)
+                _migrate_donation_history(store)
+                _migrate_request_history(store)
+                _data_store = store
+    return _data_store
+
+def _default_blood_inventory():
+    """Starting units for every blood group."""
+    return {
+        "A+": 10,
+        "A-": 5,
+        "B+": 8,
+        "B-": 4,
+        "AB+": 3,
+        "AB-": 2,
+        "O+": 15,
+        "O-": 7,
+        "last_updated": datetime.now().isoformat()
+    }
+
+def _seed_data_store(store):
+    """Populate a new data store with the default inventory and admin user."""
+    # Durable stores keep their data across restarts
+    if store.get_document('inventory', 'blood_inventory') is not None:
+        return
     
-    print("Mock Firebase initialized successfully")
-    return True
+    store.set_document('inventory', 'blood_inventory', _default_blood_inventory())
+    
+    # Create sample admin user
+    admin_id = str(uuid.uuid4())
+    store.set_document('users', admin_id, {
+        'id': admin_id,
+        'name': 'Admin User',
+        'email': 'admin@bloodbank.com',
+        'role': 'admin',
+        'phone': '555-123-4567',
+        'address': '123 Hospital St',
+        'city': 'Medical City',
+        'created_at': datetime.now().isoformat()
+    })
+
+def _migration_done(store, name):
+    """Whether a startup migration has already completed on this store."""
+    marker = store.get_document('meta', 'migrations')
+    return marker is not None and name in marker
+
+def _mark_migration_done(store, name):
+    """Record a completed startup migration so later starts skip its scan."""
+    store.set_document('meta', 'migrations', {name: datetime.now().isoformat()}, merge=True)
+
+def _migrate_donation_history(store):
+    """Move donation lists embedded in donor documents into the donations collection.
+    
+    Each donor is rewritten with summary counters in the same batch as its donations,
+    so an interrupted run picks up where it stopped. Completion is recorded in
+    meta/migrations and later starts skip the scan.
+    """
+    if _migration_done(store, 'donation_history'):
+        return
+    for donor_id, donor in store.query('users', [('role', '==', 'donor')]):
+        if 'donation_history' not in donor:
+            continue
+        writes = []
+        summary = {'donation_count': 0, 'units_donated': 0, 'last_donation_date': None}
+        for donation in donor['donation_history']:
+            donation_id = str(uuid.uuid4())
+            donation = dict(donation, donation_id=donation_id, donor_id=donor_id)
+            donation.setdefault('donation_date', '')
+            writes.append(('set', 'donations', donation_id, donation))
+            summary['donation_count'] += 1
+            summary['units_donated'] += donation.get('units', 0)
+            summary['last_donation_date'] = max(summary['last_donation_date'] or '', donation['donation_date'])
+        donor = {field: value for field, value in donor.items() if field != 'donation_history'}
+        donor.update(summary)
+        writes.append(('set', 'users', donor_id, donor))
+        store.apply_writes(writes)
+    # Totals used to be kept here; they now come from the donations aggregate
+    if store.get_document('stats', 'donations') is not None:
+        store.delete_document('stats', 'donations')
+    _mark_migration_done(store, 'donation_history')
+
+def _migrate_request_history(store):
+    """Replace request_history lists on receiver documents with a request_count.
+    
+    The history itself is read from blood_requests by user_id, where every entry already lives.
+    Completion is recorded in meta/migrations and later starts skip the scan.
+    """
+    if _migration_done(store, 'request_history'):
+        return
+    for user_id, user in store.query('users', [('role', '==', 'receiver')]):
+        if 'request_history' not in user:
+            continue
+        user = {field: value for field, value in user.items() if field != 'request_history'}
+        user['request_count'] = len(store.query('blood_requests', [('user_id', '==', user_id)], projection=[]))
+        store.set_document('users', user_id, user)
+    _mark_migration_done(store, 'request_history')
 
 class MockDocument:
     """Mock Firestore document for simulating Firestore operations."""
-    def __init__(self, doc_id, data=None, collection_name=None):
+    __slots__ = ('id', '_data', 'exists', 'collection_name', 'collection_path', 'parent_doc')
+
+    def __init__(self, doc_id, data=None, collection_name=None, collection_path=None):
         self.id = doc_id
         self._data = data or {}
         self.exists = data is not None
         self.collection_name = collection_name
+        self.collection_path = collection_path or collection_name
         self.parent_doc = None  # Reference to parent document for subcollections
 
     def get(self):
+        # Refresh from the shared store so writes from other sessions are visible
+        if self.collection_path:
+            store = get_data_store()
+            data = store.get_document(self.collection_path, self.id)
+            
+            # For inventory/blood_inventory, create it if it doesn't exist
+            if data is None and self.collection_path == 'inventory' and self.id == 'blood_inventory':
+                data = store.set_document('inventory', 'blood_inventory', _default_blood_inventory())
+            
+            self._data = data or {}
+            self.exists = data is not None
         return self
         
     def to_dict(self):
-        return self._data
+        return MockDictView(self._data)
         
     def set(self, data, merge=False):
-        if merge and self._data:
-            # Update existing data
+        if self.collection_path:
+            self._data = get_data_store().set_document(self.collection_path, self.id, data, merge=merge)
+        elif merge and self._data:
             self._data.update(data)
         else:
-            # Replace with new data
             self._data = data
         
         # Update exists status
         self.exists = True
-        
-        # Persist to session state
-        if self.collection_name:
-            # Initialize collections if they don't exist
-            if 'users' not in st.session_state.mock_db:
-                st.session_state.mock_db['users'] = {}
-            if 'blood_requests' not in st.session_state.mock_db:
-                st.session_state.mock_db['blood_requests'] = {}
-            if 'inventory' not in st.session_state.mock_db:
-                st.session_state.mock_db['inventory'] = {}
-                
-            # Handle top-level collections
-            if self.collection_name == 'users':
-                st.session_state.mock_db['users'][self.id] = self._data
-            elif self.collection_name == 'blood_requests':
-                st.session_state.mock_db['blood_requests'][self.id] = self._data
-            elif self.collection_name == 'inventory':
-                st.session_state.mock_db['inventory'][self.id] = self._data
-            # Handle subcollections - will be implemented via parent document reference
-            
         return True
         
     def update(self, data):
-        # Update data
-        if not self._data:
-            self._data = {}
-        self._data.update(data)
-        
-        # Persist to session state
-        if self.collection_name:
-            if self.collection_name == 'users':
-                if self.id in st.session_state.mock_db['users']:
-                    st.session_state.mock_db['users'][self.id].update(data)
-                else:
-                    st.session_state.mock_db['users'][self.id] = self._data
-            elif self.collection_name == 'blood_requests':
-                if self.id in st.session_state.mock_db['blood_requests']:
-                    st.session_state.mock_db['blood_requests'][self.id].update(data)
-                else:
-                    st.session_state.mock_db['blood_requests'][self.id] = self._data
-            elif self.collection_name == 'inventory':
-                if self.id in st.session_state.mock_db['inventory']:
-                    st.session_state.mock_db['inventory'][self.id].update(data)
-                else:
-                    st.session_state.mock_db['inventory'][self.id] = self._data
+        if self.collection_path:
+            self._data = get_data_store().update_document(self.collection_path, self.id, data)
+        else:
+            self._data.update(data)
         
+        self.exists = True
         return True
         
     def collection(self, collection_name):
         return MockCollection(collection_name, parent_doc=self)
+    
+    def on_snapshot(self, callback):
+        """Call callback(snapshots, changes, read_time) now and whenever this document changes."""
+        store = get_data_store()
+        return store.changes.watch(MockWatch(store, self.collection_path, callback, doc_id=self.id))
 
 class MockDocumentSnapshot:
     """Mock document snapshot returned from queries."""
+    __slots__ = ('id', '_data')
+    exists = True
+
     def __init__(self, doc_id, data):
         self.id = doc_id
         self._data = data
-        self.exists = True
         
     def to_dict(self):
-        return self._data
+        return MockDictView(self._data)
+
+class MockQuerySnapshot(Sequence):
+    """Read-only list of query results, kept as parallel id and data arrays.
+
+    Snapshot objects are only created when an item is accessed, so large
+    results (and cached ones) hold two lists rather than one object per row.
+    """
+    __slots__ = ('ids', 'data')
+
+    def __init__(self, ids=(), data=()):
+        self.ids = tuple(ids)
+        self.data = tuple(data)
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls([doc_id for doc_id, _ in rows], [data for _, data in rows])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MockQuerySnapshot(self.ids[index], self.data[index])
+        return MockDocumentSnapshot(self.ids[index], self.data[index])
+
+    def __iter__(self):
+        for doc_id, data in zip(self.ids, self.data):
+            yield MockDocumentSnapshot(doc_id, data)
+
+    def __repr__(self):
+        return f"MockQuerySnapshot({len(self.ids)} documents)"
+
+    def items(self):
+        """(id, data) pairs without building snapshot objects."""
+        return zip(self.ids, self.data)
+
+    @property
+    def docs(self):
+        return list(self)
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    @property
+    def empty(self):
+        return not self.ids
 
 class MockQuery:
     """Mock query for simulating Firestore queries."""
-    def __init__(self, collection_name, filters=None):
-        self.collection_name = collection_name
+    __slots__ = ('collection_path', 'filters', 'order_params', '_limit', '_offset', '_start_after', '_projection')
+
+    def __init__(self, collection_path, filters=None):
+        self.collection_path = collection_path
         self.filters = filters or []
         self.order_params = []
+        self._limit = None
+        self._offset = 0
+        self._start_after = None
+        self._projection = None
         
     def where(self, field, op, value):
-        self.filters.append((field, op, value))
+        if op not in QUERY_OPERATORS:
+            raise ValueError(f"Unsupported query operator: {op}")
+        self.filters.append((field, op, _unwrap(value)))
         return self
         
     def order_by(self, field, direction=None):
         self.order_params.append((field, direction))
         return self
+    
+    def limit(self, count):
+        self._limit = count
+        return self
+    
+    def offset(self, count):
+        self._offset = count
+        return self
+    
+    def start_after(self, cursor):
+        """Start after a document snapshot, a map of order field values, or a list of them."""
+        self._start_after = cursor
+        return self
+    
+    def select(self, fields):
+        """Return only the given fields; ArrayLength entries add the length of an array field."""
+        self._projection = list(fields)
+        return self
+        
+    def _cache_key(self):
+        """Key for the query cache, or None when a parameter cannot be hashed."""
+        cursor = None
+        if self._start_after is not None:
+            values, cursor_id = _cursor_values(self._start_after, _effective_orders(self.filters, self.order_params))
+            cursor = (_freeze(values), cursor_id)
+        key = (self.collection_path, _freeze(self.filters), _freeze(self.order_params), self._limit,
+               self._offset, cursor, _freeze(self._projection))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
         
     def get(self):
-        collection_data = self._get_collection_data()
-        
-        # Apply filters
-        filtered_data = collection_data
-        for field, op, value in self.filters:
-            if op == '==':
-                filtered_data = {k: v for k, v in filtered_data.items() 
-                                if field in v and v[field] == value}
-        
-        # Convert to document snapshots
-        return [MockDocumentSnapshot(doc_id, data) for doc_id, data in filtered_data.items()]
-    
-    def _get_collection_data(self):
-        # Access data from session state based on collection path
-        if self.collection_name == 'users':
-            return st.session_state.mock_db.get('users', {})
-        elif self.collection_name == 'blood_requests':
-            return st.session_state.mock_db.get('blood_requests', {})
-        elif self.collection_name == 'inventory':
-            return st.session_state.mock_db.get('inventory', {})
-        return {}
+        store = get_data_store()
+        # Read the generation first, so a write during the query only makes the entry stale
+        generation = store.generation(self.collection_path)
+        key = self._cache_key()
+        snapshots = _query_cache.get(key, generation) if key is not None else None
+        if snapshots is None:
+            results = store.query(self.collection_path, self.filters, self.order_params,
+                                  self._limit, self._offset, self._start_after, self._projection)
+            snapshots = MockQuerySnapshot.from_rows(results)
+            if key is not None:
+                _query_cache.put(key, generation, snapshots)
+        # Results are immutable, so cached ones can be shared without copying
+        return snapshots
+    
+    def stream(self):
+        """Yield snapshots one at a time instead of building a list."""
+        store = get_data_store()
+        key = self._cache_key()
+        snapshots = _query_cache.get(key, store.generation(self.collection_path)) if key is not None else None
+        if snapshots is not None:
+            yield from snapshots
+            return
+        
+        for doc_id, data in store.stream(self.collection_path, self.filters, self.order_params,
+                                         self._limit, self._offset, self._start_after, self._projection):
+            yield MockDocumentSnapshot(doc_id, data)
+    
+    def explain(self):
+        """Describe how this query would be executed, without fetching documents."""
+        return get_data_store().explain(self.collection_path, self.filters, self.order_params,
+                                        self._limit, self._offset, self._start_after)
+    
+    def on_snapshot(self, callback):
+        """Call callback(snapshots, changes, read_time) now and whenever the results change."""
+        store = get_data_store()
+        return store.changes.watch(MockWatch(store, self.collection_path, callback, None, self.filters,
+                                             self.order_params, self._limit, self._offset,
+                                             self._start_after, self._projection))
 
 class MockCollection:
     """Mock collection for simulating Firestore collections."""
+    __slots__ = ('name', 'parent_doc', 'path')
+
     def __init__(self, name, parent_doc=None):
         self.name = name
         self.parent_doc = parent_doc
+        # Subcollections live under their parent document's path
+        if parent_doc:
+            self.path = f"{parent_doc.collection_path}/{parent_doc.id}/{name}"
+        else:
+            self.path = name
         
     def document(self, doc_id=None):
         if not doc_id:
             doc_id = str(uuid.uuid4())
         
-        # Initialize the collection in mock_db if it doesn't exist
-        if self.name == 'users' and 'users' not in st.session_state.mock_db:
-            st.session_state.mock_db['users'] = {}
-        elif self.name == 'blood_requests' and 'blood_requests' not in st.session_state.mock_db:
-            st.session_state.mock_db['blood_requests'] = {}
-        elif self.name == 'inventory' and 'inventory' not in st.session_state.mock_db:
-            st.session_state.mock_db['inventory'] = {}
-        
-        # Get document data if it exists
-        collection_data = self._get_collection_data()
-        doc_data = collection_data.get(doc_id)
-        
-        # For inventory/blood_inventory, create it if it doesn't exist
-        if self.name == 'inventory' and doc_id == 'blood_inventory' and not doc_data:
-            doc_data = {
-                "A+": 10,
-                "A-": 5,
-                "B+": 8,
-                "B-": 4,
-                "AB+": 3,
-                "AB-": 2,
-                "O+": 15,
-                "O-": 7,
-                "last_updated": datetime.now().isoformat()
-            }
-            st.session_state.mock_db['inventory']['blood_inventory'] = doc_data
-        
-        # Determine the collection name to pass to MockDocument
-        collection_name = None
-        if self.parent_doc:
-            # For subcollections like notifications
-            if self.parent_doc.collection_name == 'users' and self.name == 'notifications':
-                collection_name = 'notifications'
-        else:
-            # For top-level collections
-            collection_name = self.name
-        
-        return MockDocument(doc_id, doc_data, collection_name)
+        # References are lazy; get() loads the data
+        document = MockDocument(doc_id, None, self.name, self.path)
+        document.parent_doc = self.parent_doc
+        return document
+    
+    def add(self, data):
+        """Add a document with a generated ID, returning (timestamp, document)."""
+        document = self.document()
+        document.set(data)
+        return get_server_timestamp(), document
     
     def where(self, field, op, value):
-        return MockQuery(self.name, [(field, op, value)])
+        return MockQuery(self.path).where(field, op, value)
     
     def order_by(self, field, direction=None):
-        query = MockQuery(self.name)
-        query.order_by(field, direction)
-        return query
+        return MockQuery(self.path).order_by(field, direction)
+    
+    def limit(self, count):
+        return MockQuery(self.path).limit(count)
+    
+    def offset(self, count):
+        return MockQuery(self.path).offset(count)
+    
+    def start_after(self, cursor):
+        return MockQuery(self.path).start_after(cursor)
+    
+    def select(self, fields):
+        return MockQuery(self.path).select(fields)
+    
+    def aggregate(self):
+        """Document counts kept by the store, as {'total': n, 'counts': {field: {value: n}}}."""
+        return get_data_store().aggregate(self.path)
+    
+    def on_snapshot(self, callback):
+        return MockQuery(self.path).on_snapshot(callback)
     
     def get(self):
-        collection_data = self._get_collection_data()
-        return [MockDocumentSnapshot(doc_id, data) for doc_id, data in collection_data.items()]
-    
-    def _get_collection_data(self):
-        # Access data from session state based on collection path
-        if self.parent_doc:
-            # Handle subcollections (e.g., notifications)
-            if self.name == 'notifications':
-                # Ensure parent document exists
-                if self.parent_doc.id in st.session_state.mock_db.get('users', {}):
-                    # Create notifications subcollection if it doesn't exist
-                    if 'notifications' not in st.session_state.mock_db['users'][self.parent_doc.id]:
-                        st.session_state.mock_db['users'][self.parent_doc.id]['notifications'] = {}
-                    return st.session_state.mock_db['users'][self.parent_doc.id]['notifications']
-                return {}
-        elif self.name == 'users':
-            return st.session_state.mock_db.get('users', {})
-        elif self.name == 'blood_requests':
-            return st.session_state.mock_db.get('blood_requests', {})
-        elif self.name == 'inventory':
-            return st.session_state.mock_db.get('inventory', {})
-        return {}
+        return MockQuery(self.path).get()
+    
+    def stream(self):
+        """Yield snapshots one at a time instead of building a list."""
+        for doc_id, data in get_data_store().stream(self.path):
+            yield MockDocumentSnapshot(doc_id, data)
+
+class MockWriteBatch:
+    """Mock Firestore write batch that applies buffered writes atomically on commit."""
+    def __init__(self):
+        self._writes = []
+        self._documents = []
+        self._committed = False
+    
+    def set(self, document, data, merge=False):
+        self._add('update' if merge else 'set', document, data)
+        return self
+    
+    def update(self, document, data):
+        self._add('update', document, data)
+        return self
+    
+    def delete(self, document):
+        self._add('delete', document, None)
+        return self
+    
+    def _add(self, op, document, data):
+        if self._committed:
+            raise ValueError("Cannot add writes to a committed batch")
+        self._writes.append((op, document.collection_path, document.id, data))
+        self._documents.append(document)
+    
+    def commit(self):
+        results = get_data_store().apply_writes(self._writes)
+        self._committed = True
+        
+        # Keep the document references in step with what was written
+        for document, stored in zip(self._documents, results):
+            document._data = stored or {}
+            document.exists = stored is not None
+        return results
 
 class MockFirestore:
     """Mock Firestore client for simulating Firestore database operations."""
     def collection(self, collection_name):
         return MockCollection(collection_name)
+    
+    def batch(self):
+        return MockWriteBatch()
 
 class MockAuthUser:
     """Mock Firebase Auth user object."""
@@ -275,16 +2240,16 @@ class MockAuthUser:
 class MockAuth:
     """Mock Firebase Auth for simulating authentication operations."""
     def sign_in_with_email_and_password(self, email, password):
-        # Find user with matching email
-        for user_id, user_data in st.session_state.mock_db['users'].items():
-            if user_data.get('email') == email:
-                # In a real app, we'd verify the password here, but for demo we'll accept any password
-                return {'localId': user_id, 'email': email}
+        # Find user with matching email through the unique email index
+        found = get_data_store().lookup_unique('users', 'email', email)
+        if found:
+            # In a real app, we'd verify the password here, but for demo we'll accept any password
+            return {'localId': found[0], 'email': email}
         
         # Create default users if they don't exist - for demo purposes
         if email == "admin@bloodbank.com":
             admin_id = str(uuid.uuid4())
-            st.session_state.mock_db['users'][admin_id] = {
+            MockCollection('users').document(admin_id).set({
                 'id': admin_id,
                 'name': 'Admin User',
                 'email': 'admin@bloodbank.com',
@@ -293,11 +2258,11 @@ class MockAuth:
                 'address': '123 Hospital St',
                 'city': 'Medical City',
                 'created_at': datetime.now().isoformat()
-            }
+            })
             return {'localId': admin_id, 'email': email}
         elif email == "donor@bloodbank.com":
             donor_id = str(uuid.uuid4())
-            st.session_state.mock_db['users'][donor_id] = {
+            MockCollection('users').document(donor_id).set({
                 'id': donor_id,
                 'name': 'John Donor',
                 'email': 'donor@bloodbank.com',
@@ -307,13 +2272,14 @@ class MockAuth:
                 'available': True,
                 'address': '456 Donor Ave',
                 'city': 'Blood City',
-                'donation_history': [],
+                'donation_count': 0,
+                'units_donated': 0,
                 'created_at': datetime.now().isoformat()
-            }
+            })
             return {'localId': donor_id, 'email': email}
         elif email == "receiver@bloodbank.com":
             receiver_id = str(uuid.uuid4())
-            st.session_state.mock_db['users'][receiver_id] = {
+            MockCollection('users').document(receiver_id).set({
                 'id': receiver_id,
                 'name': 'Hospital Receiver',
                 'email': 'receiver@bloodbank.com',
@@ -322,39 +2288,47 @@ class MockAuth:
                 'organization': 'City Hospital',
                 'address': '789 Hospital Blvd',
                 'city': 'Medical City',
-                'request_history': [],
+                'request_count': 0,
                 'created_at': datetime.now().isoformat()
-            }
+            })
             return {'localId': receiver_id, 'email': email}
         
         # If no match and not a default user
         raise Exception("EMAIL_NOT_FOUND")
     
     def create_user_with_email_and_password(self, email, password):
-        # Check if email already exists
-        for user_data in st.session_state.mock_db['users'].values():
-            if user_data.get('email') == email:
-                raise Exception("EMAIL_EXISTS")
+        # Check if email already exists; most new addresses are ruled out without a lookup
+        store = get_data_store()
+        if store.may_contain_unique('users', 'email', email) and store.lookup_unique('users', 'email', email):
+            raise Exception("EMAIL_EXISTS")
         
-        # Create new user
+        # Create new user; the profile document is written by the caller
         user_id = str(uuid.uuid4())
-        # Add the user to session state
-        if 'users' not in st.session_state.mock_db:
-            st.session_state.mock_db['users'] = {}
-            
         return {'localId': user_id, 'email': email}
 
+_firestore_client = None
+_auth_client = None
+_client_lock = threading.Lock()
+
 def get_firestore_db():
-    """Get the mock Firestore database instance."""
-    # Always initialize Firebase first to ensure session state is set up
-    initialize_firebase()
-    return MockFirestore()
+    """Get the mock Firestore client, created once per process and reused."""
+    global _firestore_client
+    if _firestore_client is None:
+        with _client_lock:
+            if _firestore_client is None:
+                initialize_firebase()
+                _firestore_client = MockFirestore()
+    return _firestore_client
 
 def get_auth():
-    """Get the mock Firebase Authentication instance."""
-    # Always initialize Firebase first to ensure session state is set up
-    initialize_firebase()
-    return MockAuth()
+    """Get the mock Firebase Authentication client, created once per process and reused."""
+    global _auth_client
+    if _auth_client is None:
+        with _client_lock:
+            if _auth_client is None:
+                initialize_firebase()
+                _auth_client = MockAuth()
+    return _auth_client
 
 def get_admin_auth():
     """Get the Firebase Admin Auth instance (for admin operations)."""
@@ -375,7 +2349,7 @@ def get_user_by_id(user_id):
             return user_doc.to_dict()
         return None
     except Exception as e:
-        print(f"Error in get_user_by_id: {str(e)}")
+        logger.error("Error in get_user_by_id: %s", e)
         return None
 
 def update_user_profile(user_id, data):
@@ -385,36 +2359,60 @@ def update_user_profile(user_id, data):
         db.collection('users').document(user_id).update(data)
         return True
     except Exception as e:
-        print(f"Error in update_user_profile: {str(e)}")
+        logger.error("Error in update_user_profile: %s", e)
         return False
 
 # Blood Inventory Functions
+# (version, inventory) of the last inventory read
+_inventory_cache = (None, MappingProxyType({}))
+
 def get_blood_inventory():
-    """Get the current blood inventory."""
+    """Get the current blood inventory as a read-only mapping, shared until the inventory changes."""
+    global _inventory_cache
     try:
+        version = get_data_store().document_version('inventory', 'blood_inventory')
+        cached_version, cached_inventory = _inventory_cache
+        if cached_version == version:
+            return cached_inventory
+        
         db = get_firestore_db()
         inventory_ref = db.collection('inventory').document('blood_inventory').get()
-        if inventory_ref.exists:
-            inventory_data = inventory_ref.to_dict()
-            # Remove non-blood group fields if any
-            for key in list(inventory_data.keys()):
-                if key not in ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]:
-                    inventory_data.pop(key)
-            return inventory_data
-        return {}
+        inventory_data = inventory_ref.to_dict() if inventory_ref.exists else {}
+        # Keep only the blood group fields, without touching the stored document
+        inventory = MappingProxyType({
+            key: inventory_data[key] for key in ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+            if key in inventory_data
+        })
+        
+        # A write between reading the version and the document only causes an extra reload
+        _inventory_cache = (version, inventory)
+        return inventory
     except Exception as e:
-        print(f"Error in get_blood_inventory: {str(e)}")
+        logger.error("Error in get_blood_inventory: %s", e)
         return {}
 
 def update_blood_inventory(inventory_data):
     """Update the blood inventory."""
     try:
         db = get_firestore_db()
-        inventory_data['last_updated'] = get_server_timestamp()
-        db.collection('inventory').document('blood_inventory').update(inventory_data)
+        db.collection('inventory').document('blood_inventory').update(
+            dict(inventory_data, last_updated=get_server_timestamp()))
+        return True
+    except Exception as e:
+        logger.error("Error in update_blood_inventory: %s", e)
+        return False
+
+def adjust_blood_inventory(blood_group, units):
+    """Add units of a blood group to the inventory (negative units remove them)."""
+    try:
+        db = get_firestore_db()
+        db.collection('inventory').document('blood_inventory').set({
+            blood_group: Increment(units),
+            'last_updated': get_server_timestamp()
+        }, merge=True)
         return True
     except Exception as e:
-        print(f"Error in update_blood_inventory: {str(e)}")
+        logger.error("Error in adjust_blood_inventory: %s", e)
         return False
 
 # Blood Request Functions
@@ -426,30 +2424,28 @@ def create_blood_request(request_data):
         request_data['request_id'] = request_ref.id
         request_data['created_at'] = get_server_timestamp()
         request_data['status'] = 'pending'
-        request_ref.set(request_data)
         
-        # Update user's request history
+        # Write the request and the user's request count together;
+        # the history is read back from blood_requests by user_id
+        batch = db.batch()
+        batch.set(request_ref, request_data)
+        
         user_ref = db.collection('users').document(request_data['user_id'])
-        user_data = user_ref.get().to_dict()
-        
-        if user_data:
-            request_history = user_data.get('request_history', [])
-            request_history.append({
-                'request_id': request_ref.id,
-                'blood_group': request_data['blood_group'],
-                'units': request_data['units'],
-                'created_at': datetime.now().isoformat(),
-                'status': 'pending'
-            })
-            user_ref.update({'request_history': request_history})
+        if user_ref.get().exists:
+            batch.update(user_ref, {'request_count': Increment(1)})
         
+        batch.commit()
         return request_ref.id
     except Exception as e:
-        print(f"Error in create_blood_request: {str(e)}")
+        logger.error("Error in create_blood_request: %s", e)
         raise
 
-def get_blood_requests(status=None):
-    """Get blood requests with optional status filter."""
+def get_blood_requests(status=None, limit=None, start_after=None, fields=None):
+    """Get blood requests, newest first, with optional status filter and paging.
+    
+    Pass the request_id of the last request of a page as start_after to get the next page,
+    and `fields` to keep only those fields.
+    """
     try:
         db = get_firestore_db()
         if status:
@@ -457,11 +2453,38 @@ def get_blood_requests(status=None):
         else:
             requests_ref = db.collection('blood_requests')
         
-        # Get all requests
-        requests = requests_ref.get()
-        return [doc.to_dict() for doc in requests]
+        requests_ref = requests_ref.order_by('created_at', 'desc')
+        if start_after:
+            requests_ref = requests_ref.start_after(db.collection('blood_requests').document(start_after).get())
+        if limit:
+            requests_ref = requests_ref.limit(limit)
+        if fields is not None:
+            requests_ref = requests_ref.select(fields)
+        
+        return [MockDictView(data) for data in requests_ref.get().data]
     except Exception as e:
-        print(f"Error in get_blood_requests: {str(e)}")
+        logger.error("Error in get_blood_requests: %s", e)
+        return []
+
+def get_user_requests(user_id, limit=None, start_after=None, fields=None):
+    """Get the blood requests a user made, newest first.
+    
+    Pass the request_id of the last request of a page as start_after to get the next page,
+    and `fields` to keep only those fields.
+    """
+    try:
+        db = get_firestore_db()
+        requests_col = db.collection('blood_requests')
+        requests_ref = requests_col.where('user_id', '==', user_id).order_by('created_at', 'desc')
+        if start_after:
+            requests_ref = requests_ref.start_after(requests_col.document(start_after).get())
+        if limit:
+            requests_ref = requests_ref.limit(limit)
+        if fields is not None:
+            requests_ref = requests_ref.select(fields)
+        return [MockDictView(data) for data in requests_ref.get().data]
+    except Exception as e:
+        logger.error("Error in get_user_requests: %s", e)
         return []
 
 def get_blood_request(request_id):
@@ -473,7 +2496,7 @@ def get_blood_request(request_id):
             return request_doc.to_dict()
         return None
     except Exception as e:
-        print(f"Error in get_blood_request: {str(e)}")
+        logger.error("Error in get_blood_request: %s", e)
         return None
 
 def update_blood_request(request_id, data):
@@ -486,31 +2509,12 @@ def update_blood_request(request_id, data):
         if not request_doc.exists:
             return False
         
+        # The requester's history is derived from this document, so a status
+        # change is a single write
         request_ref.update(data)
-        
-        # If status is changing, update request in user's history
-        if 'status' in data:
-            request_data = request_doc.to_dict()
-            user_id = request_data.get('user_id')
-            
-            if user_id:
-                user_ref = db.collection('users').document(user_id)
-                user_doc = user_ref.get()
-                
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    request_history = user_data.get('request_history', [])
-                    
-                    # Find and update the request in history
-                    for i, req in enumerate(request_history):
-                        if req.get('request_id') == request_id:
-                            request_history[i]['status'] = data['status']
-                            user_ref.update({'request_history': request_history})
-                            break
-        
         return True
     except Exception as e:
-        print(f"Error in update_blood_request: {str(e)}")
+        logger.error("Error in update_blood_request: %s", e)
         return False
 
 # Donor Functions
@@ -527,13 +2531,12 @@ def get_available_donors(blood_group=None):
         donor_list = []
         
         for doc in donors:
-            donor_data = doc.to_dict()
-            donor_data['id'] = doc.id  # Add document ID for reference
-            donor_list.append(donor_data)
+            # Copy the top level to add the document ID; nested fields stay read-only
+            donor_list.append(dict(doc.to_dict(), id=doc.id))
         
         return donor_list
     except Exception as e:
-        print(f"Error in get_available_donors: {str(e)}")
+        logger.error("Error in get_available_donors: %s", e)
         return []
 
 def record_donation(donor_id, donation_data):
@@ -549,43 +2552,60 @@ def record_donation(donor_id, donation_data):
         if not donor_doc.exists:
             return False
         
-        donor_data = donor_doc.to_dict()
-        donation_history = donor_data.get('donation_history', [])
-        donation_history.append(donation_data)
+        # Add the donation and update the donor's counters and the inventory in one commit;
+        # nothing here grows with the donor's history
+        batch = db.batch()
+        donation_ref = db.collection('donations').document()
+        donation_data['donation_id'] = donation_ref.id
+        donation_data['donor_id'] = donor_id
+        batch.set(donation_ref, donation_data)
         
-        # Update donor's donation history
-        donor_ref.update({'donation_history': donation_history})
-        
-        # Update blood inventory
-        blood_group = donation_data['blood_group']
-        units = donation_data['units']
+        summary = {
+            'donation_count': Increment(1),
+            'units_donated': Increment(donation_data.get('units', 0))
+        }
+        if donation_data.get('donation_date', '') >= (donor_doc.to_dict().get('last_donation_date') or ''):
+            summary['last_donation_date'] = donation_data.get('donation_date')
+        batch.update(donor_ref, summary)
         
+        # Update blood inventory in place, no read needed
         inventory_ref = db.collection('inventory').document('blood_inventory')
-        inventory_doc = inventory_ref.get()
-        
-        if inventory_doc.exists:
-            inventory_data = inventory_doc.to_dict()
-            
-            if blood_group in inventory_data:
-                current_units = inventory_data.get(blood_group, 0)
-                inventory_data[blood_group] = current_units + units
-            else:
-                inventory_data[blood_group] = units
-            
-            inventory_data['last_updated'] = get_server_timestamp()
-            inventory_ref.update(inventory_data)
-        else:
-            inventory_ref.set({
-                blood_group: units,
-                'last_updated': get_server_timestamp()
-            })
+        batch.set(inventory_ref, {
+            donation_data['blood_group']: Increment(donation_data['units']),
+            'last_updated': get_server_timestamp()
+        }, merge=True)
         
+        batch.commit()
         return True
     except Exception as e:
-        print(f"Error in record_donation: {str(e)}")
+        logger.error("Error in record_donation: %s", e)
         return False
 
+def get_donor_donations(donor_id, limit=None, start_after=None):
+    """Get a donor's donations, newest donation date first.
+    
+    Pass the donation_id of the last donation of a page as start_after to get the next page.
+    """
+    try:
+        db = get_firestore_db()
+        donations_col = db.collection('donations')
+        donations_ref = donations_col.where('donor_id', '==', donor_id).order_by('donation_date', 'desc')
+        if start_after:
+            donations_ref = donations_ref.start_after(donations_col.document(start_after).get())
+        if limit:
+            donations_ref = donations_ref.limit(limit)
+        return [MockDictView(data) for data in donations_ref.get().data]
+    except Exception as e:
+        logger.error("Error in get_donor_donations: %s", e)
+        return []
+
 # Notification Functions
+# Read notifications older than this are deleted when a user marks notifications read
+NOTIFICATION_TTL_DAYS = 30
+# Background delivery: worker threads and the most notifications written per batch
+NOTIFICATION_WORKERS = int(os.environ.get('DONORLINK_NOTIFICATION_WORKERS', '2'))
+NOTIFICATION_BATCH_SIZE = 500
+
 def create_notification(user_id, notification_data):
     """Create a notification for a user."""
     try:
@@ -599,28 +2619,171 @@ def create_notification(user_id, notification_data):
         
         return notification_ref.id
     except Exception as e:
-        print(f"Error in create_notification: {str(e)}")
+        logger.error("Error in create_notification: %s", e)
         raise
 
-def get_notifications(user_id):
-    """Get notifications for a user."""
+def _notification_writes(user_ids, notification_data, created_at):
+    """Build one 'set' write per user for a shared notification payload."""
+    writes = []
+    for user_id in user_ids:
+        notification_id = str(uuid.uuid4())
+        writes.append(('set', f"users/{user_id}/notifications", notification_id,
+                       dict(notification_data, created_at=created_at, read=False, id=notification_id)))
+    return writes
+
+def create_notifications_bulk(user_ids, notification_data):
+    """Create the same notification for many users in one batch, returning the new notification IDs."""
+    try:
+        # Each user gets one copy, even if listed twice
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+        writes = _notification_writes(user_ids, notification_data, get_server_timestamp())
+        if writes:
+            get_data_store().apply_writes(writes)
+        return [write[2] for write in writes]
+    except Exception as e:
+        logger.error("Error in create_notifications_bulk: %s", e)
+        raise
+
+class MockNotificationQueue:
+    """In-process queue of notifications delivered by a pool of background worker threads.
+    
+    Workers take as many queued jobs as fit in one batch and write them with a
+    single apply_writes call. Delivery errors are counted and logged; the jobs
+    are not retried.
+    """
+    def __init__(self, workers=NOTIFICATION_WORKERS, batch_size=NOTIFICATION_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._metrics = {'queued': 0, 'delivered': 0, 'failed': 0, 'batches': 0,
+                         'largest_batch': 0, 'total_delay': 0.0, 'last_delay': 0.0}
+        self._workers = [threading.Thread(target=self._run, name=f"notification-worker-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, user_ids, notification_data):
+        """Queue one notification for many users and return at once."""
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+        if not user_ids:
+            return 0
+        created_at = get_server_timestamp()
+        with self._condition:
+            self._pending += len(user_ids)
+            self._metrics['queued'] += len(user_ids)
+        
+        # Large fan-outs are split so no single batch holds the store for long
+        for start in range(0, len(user_ids), self.batch_size):
+            self._queue.put((user_ids[start:start + self.batch_size], dict(notification_data),
+                             created_at, time.monotonic()))
+        return len(user_ids)
+
+    def flush(self, timeout=None):
+        """Wait until every queued notification is written; False if the timeout ran out first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def metrics(self):
+        with self._condition:
+            metrics = dict(self._metrics, pending=self._pending)
+        metrics['average_delay'] = metrics['total_delay'] / metrics['batches'] if metrics['batches'] else 0.0
+        return metrics
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            size = len(jobs[0][0])
+            
+            # Take whatever else is already waiting, up to one batch
+            while size < self.batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                size += len(job[0])
+            self._deliver(jobs, size)
+
+    def _deliver(self, jobs, size):
+        writes = []
+        for user_ids, notification_data, created_at, _ in jobs:
+            writes.extend(_notification_writes(user_ids, notification_data, created_at))
+        
+        delivered = True
+        try:
+            get_data_store().apply_writes(writes)
+        except Exception as e:
+            delivered = False
+            logger.error("Error in notification delivery: %s", e)
+        
+        delay = time.monotonic() - min(job[3] for job in jobs)
+        with self._condition:
+            self._metrics['delivered' if delivered else 'failed'] += size
+            self._metrics['batches'] += 1
+            self._metrics['largest_batch'] = max(self._metrics['largest_batch'], size)
+            self._metrics['total_delay'] += delay
+            self._metrics['last_delay'] = delay
+            self._pending -= size
+            self._condition.notify_all()
+
+_notification_queue = None
+_notification_queue_lock = threading.Lock()
+
+def get_notification_queue():
+    """Get the process-wide notification queue, starting its workers on first use."""
+    global _notification_queue
+    if _notification_queue is None:
+        with _notification_queue_lock:
+            if _notification_queue is None:
+                _notification_queue = MockNotificationQueue()
+                # Give queued notifications a chance to be written before the process exits
+                atexit.register(_notification_queue.flush, 5)
+    return _notification_queue
+
+def queue_notifications(user_ids, notification_data):
+    """Queue a notification for many users to be written in the background; returns how many were queued."""
+    try:
+        return get_notification_queue().put(user_ids, notification_data)
+    except Exception as e:
+        logger.error("Error in queue_notifications: %s", e)
+        return 0
+
+def flush_notifications(timeout=None):
+    """Wait for queued notifications to be written; returns False if the timeout ran out first."""
+    return get_notification_queue().flush(timeout)
+
+def get_notification_metrics():
+    """Delivery counts and delays of the background notification queue."""
+    return get_notification_queue().metrics()
+
+def get_notifications(user_id, limit=None, start_after=None):
+    """Get notifications for a user, newest first.
+    
+    Pass the id of the last notification of a page as start_after to get the next page.
+    """
     try:
         db = get_firestore_db()
-        notifications_ref = db.collection('users').document(user_id).collection('notifications').order_by('created_at', 'desc')
+        notifications_col = db.collection('users').document(user_id).collection('notifications')
+        notifications_ref = notifications_col.order_by('created_at', 'desc')
+        if start_after:
+            notifications_ref = notifications_ref.start_after(notifications_col.document(start_after).get())
+        if limit:
+            notifications_ref = notifications_ref.limit(limit)
         notifications = notifications_ref.get()
         
         result = []
         for doc in notifications:
             notification_data = doc.to_dict()
-            # Convert server timestamp to string format if needed
-            if notification_data.get('created_at'):
-                if isinstance(notification_data['created_at'], datetime):
-                    notification_data['created_at'] = notification_data['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+            # Convert server timestamp to string format if needed, on a copy
+            if isinstance(notification_data.get('created_at'), datetime):
+                notification_data = dict(notification_data,
+                                         created_at=notification_data['created_at'].strftime('%Y-%m-%d %H:%M:%S'))
             result.append(notification_data)
         
         return result
     except Exception as e:
-        print(f"Error in get_notifications: {str(e)}")
+        logger.error("Error in get_notifications: %s", e)
         return []
 
 def mark_notification_as_read(user_id, notification_id):
@@ -630,14 +2793,78 @@ def mark_notification_as_read(user_id, notification_id):
         db.collection('users').document(user_id).collection('notifications').document(notification_id).update({
             'read': True
         })
+        evict_read_notifications(user_id)
         return True
     except Exception as e:
-        print(f"Error in mark_notification_as_read: {str(e)}")
+        logger.error("Error in mark_notification_as_read: %s", e)
         return False
 
+def mark_all_notifications_as_read(user_id):
+    """Mark every unread notification of a user as read, returning how many changed."""
+    try:
+        db = get_firestore_db()
+        notifications_col = db.collection('users').document(user_id).collection('notifications')
+        unread = notifications_col.where('read', '==', False).get()
+        
+        batch = db.batch()
+        for doc_id in unread.ids:
+            batch.update(notifications_col.document(doc_id), {'read': True})
+        batch.commit()
+        
+        evict_read_notifications(user_id)
+        return len(unread)
+    except Exception as e:
+        logger.error("Error in mark_all_notifications_as_read: %s", e)
+        return 0
+
+def get_unread_notification_count(user_id):
+    """Get the number of unread notifications from the maintained counter."""
+    try:
+        db = get_firestore_db()
+        aggregate = db.collection('users').document(user_id).collection('notifications').aggregate()
+        return aggregate['counts']['read'].get(False, 0)
+    except Exception as e:
+        logger.error("Error in get_unread_notification_count: %s", e)
+        return 0
+
+def evict_read_notifications(user_id, max_age_days=NOTIFICATION_TTL_DAYS):
+    """Delete a user's read notifications older than max_age_days, returning how many were removed."""
+    try:
+        db = get_firestore_db()
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        notifications_col = db.collection('users').document(user_id).collection('notifications')
+        expired = notifications_col.where('read', '==', True).where('created_at', '<', cutoff).get()
+        if not expired:
+            return 0
+        
+        batch = db.batch()
+        for doc_id in expired.ids:
+            batch.delete(notifications_col.document(doc_id))
+        batch.commit()
+        return len(expired)
+    except Exception as e:
+        logger.error("Error in evict_read_notifications: %s", e)
+        return 0
+
+def get_query_cache_stats():
+    """Hit, miss and eviction counts of the query result cache."""
+    return _query_cache.stats()
+
+def get_data_version(collection, doc_id=None):
+    """A value that changes whenever a document or collection does, for keying caches of derived data.
+    
+    With doc_id it is the version of a document in VERSIONED_COLLECTIONS, otherwise the
+    collection's generation. Both are kept in the database with SQLite, so writes from
+    other processes change them too.
+    """
+    store = get_data_store()
+    if doc_id is not None:
+        return store.document_version(collection, doc_id)
+    return store.generation(collection)
+
 # Admin Functions
-def get_all_users(role=None):
-    """Get all users with optional role filter."""
+def get_all_users(role=None, fields=None):
+    """Get all users with optional role filter, keeping only `fields` when given."""
     try:
         db = get_firestore_db()
         if role:
@@ -645,96 +2872,68 @@ def get_all_users(role=None):
         else:
             users_ref = db.collection('users')
         
-        users = users_ref.get()
+        if fields is not None:
+            users_ref = users_ref.select(fields)
+        
         user_list = []
         
-        for doc in users:
-            user_data = doc.to_dict()
-            user_data['id'] = doc.id  # Add document ID for reference
-            user_list.append(user_data)
+        # get() is served from the query cache until a user document changes
+        for doc in users_ref.get():
+            # Copy the top level to add the document ID; nested fields stay read-only
+            user_list.append(dict(doc.to_dict(), id=doc.id))
         
         return user_list
     except Exception as e:
-        print(f"Error in get_all_users: {str(e)}")
+        logger.error("Error in get_all_users: %s", e)
         return []
 
 def get_donation_stats():
     """Get donation statistics."""
     try:
         db = get_firestore_db()
-        users_ref = db.collection('users').where('role', '==', 'donor')
-        users = users_ref.get()
+        # The store keeps these counts current on every donations write
+        aggregate = db.collection('donations').aggregate()
         
-        total_donations = 0
         donations_by_group = {
             "A+": 0, "A-": 0, "B+": 0, "B-": 0, 
             "AB+": 0, "AB-": 0, "O+": 0, "O-": 0
         }
-        
-        for doc in users:
-            user_data = doc.to_dict()
-            donation_history = user_data.get('donation_history', [])
-            
-            for donation in donation_history:
-                total_donations += 1
-                blood_group = donation.get('blood_group')
-                if blood_group in donations_by_group:
-                    donations_by_group[blood_group] += 1
+        for blood_group in donations_by_group:
+            donations_by_group[blood_group] = aggregate['counts']['blood_group'].get(blood_group, 0)
         
         return {
-            'total_donations': total_donations,
+            'total_donations': aggregate['total'],
             'donations_by_group': donations_by_group
         }
     except Exception as e:
-        print(f"Error in get_donation_stats: {str(e)}")
+        logger.error("Error in get_donation_stats: %s", e)
         return {'total_donations': 0, 'donations_by_group': {}}
 
 def get_request_stats():
     """Get request statistics."""
     try:
         db = get_firestore_db()
-        requests_ref = db.collection('blood_requests')
-        requests = requests_ref.get()
-        
-        total_requests = 0
-        pending_requests = 0
-        approved_requests = 0
-        completed_requests = 0
-        canceled_requests = 0
+        # The store keeps these counts current on every blood_requests write
+        aggregate = db.collection('blood_requests').aggregate()
+        by_status = aggregate['counts']['status']
         
         requests_by_group = {
             "A+": 0, "A-": 0, "B+": 0, "B-": 0, 
             "AB+": 0, "AB-": 0, "O+": 0, "O-": 0
         }
-        
-        for doc in requests:
-            request_data = doc.to_dict()
-            total_requests += 1
-            
-            status = request_data.get('status')
-            if status == 'pending':
-                pending_requests += 1
-            elif status == 'approved':
-                approved_requests += 1
-            elif status == 'completed':
-                completed_requests += 1
-            elif status == 'cancelled':
-                canceled_requests += 1
-            
-            blood_group = request_data.get('blood_group')
-            if blood_group in requests_by_group:
-                requests_by_group[blood_group] += 1
+        for blood_group in requests_by_group:
+            requests_by_group[blood_group] = aggregate['counts']['blood_group'].get(blood_group, 0)
         
         return {
-            'total_requests': total_requests,
-            'pending_requests': pending_requests,
-            'approved_requests': approved_requests,
-            'completed_requests': completed_requests,
-            'canceled_requests': canceled_requests,
+            'total_requests': aggregate['total'],
+            'pending_requests': by_status.get('pending', 0),
+            'approved_requests': by_status.get('approved', 0),
+            'completed_requests': by_status.get('completed', 0),
+            'canceled_requests': by_status.get('cancelled', 0),
             'requests_by_group': requests_by_group
         }
     except Exception as e:
-        print(f"Error in get_request_stats: {str(e)}")
+        logger.error("Error in get_request_stats: %s", e)
         return {
             'total_requests': 0,
             'pending_requests': 0,
@@ -4,6 +4,9 @@ import dashboard
 from utils import display_message
 from datetime import datetime
 
+# Donations shown per page in the donation history tab
+DONATIONS_PAGE_SIZE = 10
+
 def show_donor_dashboard():
     """Display the donor dashboard"""
     st.title("🩸 Donor Dashboard")
@@ -66,7 +69,8 @@ def show_donor_profile():
             
             try:
                 database.update_user_profile(st.session_state.user_id, updated_data)
-                st.session_state.user.update(updated_data)
+                # Reload rather than edit the session copy, which is a read-only view of the stored user
+                st.session_state.user = database.get_user_by_id(st.session_state.user_id) or st.session_state.user
                 display_message("success", "Profile updated successfully!")
             except Exception as e:
                 display_message("error", f"Failed to update profile: {str(e)}")
@@ -76,7 +80,13 @@ def show_donation_history():
     st.header("Donation History")
     
     user = st.session_state.user
-    donation_history = user.get('donation_history', [])
+    
+    # Page through the donations index, newest first; each entry is the cursor a page starts after
+    page_starts = st.session_state.setdefault(f"donation_page_starts_{st.session_state.user_id}", [None])
+    donation_history = database.get_donor_donations(
+        st.session_state.user_id, limit=DONATIONS_PAGE_SIZE + 1, start_after=page_starts[-1])
+    has_more = len(donation_history) > DONATIONS_PAGE_SIZE
+    donation_history = donation_history[:DONATIONS_PAGE_SIZE]
     
     if not donation_history:
         st.info("You haven't made any donations yet.")
@@ -90,9 +100,8 @@ def show_donation_history():
         with col1:
             if st.button("Record New Donation", use_container_width=True):
                 st.session_state.show_donation_form = True
-        
-        # Sort by date, newest first
-        donation_history.sort(key=lambda x: x.get('donation_date', ''), reverse=True)
+        with col2:
+            st.write(f"Total donations: {user.get('donation_count', 0)} ({user.get('units_donated', 0)} units)")
         
         for i, donation in enumerate(donation_history):
             with st.expander(f"Donation on {donation.get('donation_date', 'Unknown date')}"):
@@ -109,6 +118,16 @@ def show_donation_history():
                 
                 if donation.get('notes'):
                     st.write("Notes:", donation.get('notes'))
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(page_starts) > 1 and st.button("Newer Donations", use_container_width=True):
+                page_starts.pop()
+                st.rerun()
+        with col2:
+            if has_more and st.button("Older Donations", use_container_width=True):
+                page_starts.append(donation_history[-1].get('donation_id'))
+                st.rerun()
     
     # Show donation form if requested
     if st.session_state.get('show_donation_form', False):
@@ -148,11 +167,9 @@ def show_donation_history():
                     result = database.record_donation(st.session_state.user_id, donation_data)
                     
                     if result:
-                        # Update the user's donation history in session state
-                        if 'donation_history' not in st.session_state.user:
-                            st.session_state.user['donation_history'] = []
-                        
-                        st.session_state.user['donation_history'].append(donation_data)
+                        # Reload the user so session state has the new counters, and go back to the newest page
+                        st.session_state.user = database.get_user_by_id(st.session_state.user_id) or st.session_state.user
+                        st.session_state[f"donation_page_starts_{st.session_state.user_id}"] = [None]
                         
                         # Hide the form and show success message
                         st.session_state.show_donation_form = False
@@ -242,12 +259,9 @@ def show_blood_requests():
                             'request_id': request.get('request_id')
                         }
                         
-                        # Get admin users
-                        db = database.get_firestore_db()
-                        admin_users = database.get_all_users(role="admin")
-                        
-                        for admin in admin_users:
-                            database.create_notification(admin.get('id'), admin_notification)
+                        # Queue notifications for all admins; they are written in the background
+                        admin_users = database.get_all_users(role="admin", fields=[])
+                        database.queue_notifications([admin.get('id') for admin in admin_users], admin_notification)
                         
                         display_message("success", "Your donation offer has been sent to the requester!")
                     except Exception as e:
@@ -60,7 +60,8 @@ def show_receiver_profile():
             
             try:
                 database.update_user_profile(st.session_state.user_id, updated_data)
-                st.session_state.user.update(updated_data)
+                # Reload rather than edit the session copy, which is a read-only view of the stored user
+                st.session_state.user = database.get_user_by_id(st.session_state.user_id) or st.session_state.user
                 display_message("success", "Profile updated successfully!")
             except Exception as e:
                 display_message("error", f"Failed to update profile: {str(e)}")
@@ -120,16 +121,9 @@ def show_request_form():
                     'request_id': request_id
                 }
                 
-                # Get admin users and notify them
-                admin_users = database.get_all_users(role="admin")
-                
-                for admin in admin_users:
-                    admin_id = admin.get('id')
-                    if admin_id:
-                        database.create_notification(admin_id, admin_notification)
-                
-                # Also notify matching donors
-                donors = database.get_available_donors()
+                # Queue notifications for admins; they are written in the background
+                admin_users = database.get_all_users(role="admin", fields=[])
+                database.queue_notifications([admin.get('id') for admin in admin_users], admin_notification)
                 
                 # Blood type compatibility chart: recipient <- can receive from
                 compatibility = {
@@ -143,19 +137,17 @@ def show_request_form():
                     "AB+": ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"]
                 }
                 
-                compatible_donors = [
-                    d for d in donors if d.get('blood_group') in compatibility.get(blood_group, [])
-                ]
+                # Also notify matching donors, looked up per compatible blood group
+                donor_ids = []
+                for donor_group in compatibility.get(blood_group, []):
+                    donor_ids.extend(donor.get('id') for donor in database.get_available_donors(donor_group))
                 
-                for donor in compatible_donors:
-                    donor_id = donor.get('id')
-                    if donor_id:
-                        donor_notification = {
-                            'message': f"Urgent blood request: {units} units of {blood_group} with {urgency} urgency. Your blood type is compatible!",
-                            'type': 'compatible_request',
-                            'request_id': request_id
-                        }
-                        database.create_notification(donor_id, donor_notification)
+                donor_notification = {
+                    'message': f"Urgent blood request: {units} units of {blood_group} with {urgency} urgency. Your blood type is compatible!",
+                    'type': 'compatible_request',
+                    'request_id': request_id
+                }
+                database.queue_notifications(donor_ids, donor_notification)
                 
                 display_message("success", "Blood request submitted successfully!")
                 
@@ -179,7 +171,7 @@ def show_my_requests():
     pending_requests = requests_df[requests_df['Status'] == 'pending']
     
     if pending_requests.empty:
-        st.info("You have no pending requests that can be cancelled.")
+        st.info("You have no pending requests on this page that can be cancelled.")
         return
     
     # Create selection for cancellation
@@ -202,11 +194,8 @@ def show_my_requests():
                 'request_id': selected_request
             }
             
-            admin_users = database.get_all_users(role="admin")
-            for admin in admin_users:
-                admin_id = admin.get('id')
-                if admin_id:
-                    database.create_notification(admin_id, admin_notification)
+            admin_users = database.get_all_users(role="admin", fields=[])
+            database.queue_notifications([admin.get('id') for admin in admin_users], admin_notification)
             
             display_message("success", "Request cancelled successfully!")
             st.rerun()
@@ -242,8 +231,7 @@ def show_available_donors():
                     
                     with col2:
                         # Show donation history count
-                        donation_history = donor.get('donation_history', [])
-                        st.write(f"Previous donations: {len(donation_history)}")
+                        st.write(f"Previous donations: {donor.get('donation_count', 0)}")
                     
                     with col3:
                         # Contact button
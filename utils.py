@@ -22,6 +22,14 @@ def display_message(type, message):
     elif type == "error":
         st.error(message)
 
+def lazy_tabs(labels, key):
+    """Show tab-style navigation and return the selected label.
+    
+    Unlike st.tabs, which runs every tab on each rerun, the caller renders only
+    the selected section. The choice is kept in session state under key.
+    """
+    return st.radio("Section", labels, key=key, horizontal=True, label_visibility="collapsed")
+
 def format_date(date_str):
     """Format date string for display"""
     if not date_str: